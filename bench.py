@@ -0,0 +1,170 @@
+"""Benchmarks for word bank persistence, memory use and frame rendering.
+
+Runs headless against synthetic banks in a temporary directory, so the
+real wat.csv is never touched:
+
+    python bench.py
+    python bench.py --sizes 60 1000 --frames 300
+    python bench.py --memory --sizes 1000 100000 1000000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import wat
+from scheduler import create_scheduler
+from wordbank import WordBank
+
+DEFAULT_SIZES = [60, 1000, 10000, 100000, 1000000]
+
+
+def write_bank(path, rows):
+    """Write a synthetic bank with every word unshown"""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write('word,best_response,shown\n')
+        for i in range(rows):
+            file.write(f'WORD{i},I respond to word {i} with a positive sentence,false\n')
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def report(name, rows, seconds, calls=1):
+    per_call = seconds / calls * 1000
+    print(f"{name:<22} rows={rows:<9} {per_call:10.3f} ms" + (f"  ({calls} calls)" if calls > 1 else ""))
+
+
+def load_dict_rows(path):
+    """The old layout: one dict per row, each word upper-cased into a fresh string"""
+    rows = []
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for line_index, fields in enumerate(reader, 1):
+            rows.append({
+                'word': fields[0].upper(),
+                'response': fields[1],
+                'meaning': '',
+                'line_index': line_index,
+                'shown': fields[2].lower() == 'true'
+            })
+    return rows
+
+
+def load_bank(path):
+    bank = WordBank(path, use_cache=False)
+    bank.load()
+    return bank
+
+
+def retained_memory(func, *args):
+    """Bytes still allocated by func's result once it returns"""
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_memory(rows):
+    write_bank('wat.csv', rows)
+    dict_size = retained_memory(load_dict_rows, 'wat.csv')
+    bank_size = retained_memory(load_bank, 'wat.csv')
+    print(f"{'memory':<22} rows={rows:<9} dicts {dict_size / 2**20:9.1f} MiB   "
+          f"bank {bank_size / 2**20:9.1f} MiB   ({dict_size / bank_size:.1f}x smaller)")
+
+
+def bench_bank(app, rows, frames):
+    app.word_bank.close()
+    app.writer.flush()
+    write_bank('wat.csv', rows)
+    if os.path.exists('wat.csv.journal'):
+        os.remove('wat.csv.journal')
+    app.word_bank = WordBank('wat.csv', writer=app.writer)
+    app.scheduler = create_scheduler('sequential', app.word_bank)
+
+    seconds, _ = timed(app.load_words)
+    report('load_words', rows, seconds)
+
+    # Second startup reads the binary cache written by the first
+    app.writer.flush()
+    app.word_bank = WordBank('wat.csv', writer=app.writer)
+    app.scheduler = create_scheduler('sequential', app.word_bank)
+    seconds, _ = timed(app.load_words)
+    report('  from cache', rows, seconds)
+
+    # Main-thread cost of a word transition, then the time for the writer to catch up
+    words = app.current_session_words
+    start = time.perf_counter()
+    for word_data in words:
+        app.mark_word_shown(word_data.row)
+    report('mark_word_shown', rows, time.perf_counter() - start, len(words))
+    seconds, _ = timed(app.writer.flush)
+    report('  journal flush', rows, seconds)
+
+    # Next session starts after the 60 rows just shown
+    seconds, _ = timed(app.word_bank.session_words, app.max_words_per_session)
+    report('session select', rows, seconds)
+
+    seconds, _ = timed(app.compact_progress)
+    seconds += timed(app.writer.flush)[0]
+    report('compaction', rows, seconds)
+
+    seconds, _ = timed(app.reset_all_words)
+    seconds += timed(app.writer.flush)[0]
+    report('reset_all_words', rows, seconds)
+
+    app.load_words()
+    app.start_session()
+    start = time.perf_counter()
+    for _ in range(frames):
+        app.time_source.advance(1 / 60)
+        app.screen.fill(wat.BLACK)
+        app.draw_screen()
+        wat.pygame.display.flip()
+    report('frame', rows, time.perf_counter() - start, frames)
+    app.is_running = False
+    app.waiting_for_start = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark word bank I/O and rendering")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="bank sizes in rows")
+    parser.add_argument('--frames', type=int, default=600,
+                        help="frames to render per bank size")
+    parser.add_argument('--memory', action='store_true',
+                        help="compare the bank's memory use with a dict per row instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        if args.memory:
+            for rows in args.sizes:
+                bench_memory(rows)
+            return
+
+        write_bank('wat.csv', DEFAULT_SIZES[0])
+        app = wat.WATApp(headless=True, time_source=wat.VirtualClock())
+
+        for rows in args.sizes:
+            bench_bank(app, rows, args.frames)
+
+        app.word_bank.close()
+        app.writer.close()
+        wat.pygame.quit()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
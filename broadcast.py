@@ -0,0 +1,385 @@
+"""Group WAT sessions driven by one authoritative clock.
+
+One machine runs the server, which owns the session schedule, and every
+candidate's machine runs a display client:
+
+    python broadcast.py serve --bank wat.csv --port 8765
+    python wat.py --connect server-host:8765 --controller   # operator screen
+    python wat.py --connect server-host:8765                # candidate screens
+
+The controller's ENTER starts a session and SPACE pauses or resumes it for
+everyone. Each client estimates the server's clock offset when it connects
+and flips words at the shared deadlines. Network latency therefore shifts
+only when a client hears about a flip, not when its screen flips. Clients
+that join late, or reconnect, get a full snapshot.
+
+    python broadcast.py loadtest --clients 300 --words 10 --duration 0.5
+"""
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import threading
+import time
+
+from wordbank import BackgroundWriter, WordBank
+
+DEFAULT_PORT = 8765
+MAX_CLIENT_BUFFER = 64 * 1024  # Clients this far behind are dropped rather than slowing the broadcast
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class BroadcastServer:
+    """Owns the session schedule and streams state changes to every client"""
+
+    def __init__(self, bank=None, words=None, word_duration=17, max_words_per_session=60):
+        self.bank = bank
+        self.fixed_words = words
+        self.word_duration = word_duration
+        self.max_words_per_session = max_words_per_session
+        self.clients = set()
+        self.words = []
+        self.rows = []
+        self.session_id = 0
+        self.index = 0
+        self.running = False
+        self.paused = False
+        self.deadline = None
+        self.paused_remaining = 0
+        self.start_requested = asyncio.Event()
+        self.changed = asyncio.Event()
+        self.session_done = asyncio.Event()
+
+    def next_session_words(self):
+        if self.bank is None:
+            self.rows = []
+            return list(self.fixed_words or [])
+        if self.bank.unshown_count == 0 and self.bank.total_count > 0:
+            self.bank.reset()
+        session = self.bank.session_words(self.max_words_per_session)
+        self.rows = [word_data.row for word_data in session]
+        return [word_data.word for word_data in session]
+
+    def state_message(self, include_words=False):
+        message = {
+            'type': 'state',
+            'session': self.session_id,
+            'running': self.running,
+            'index': self.index,
+            'duration': self.word_duration,
+            'paused': self.paused,
+            'remaining': self.paused_remaining,
+            'deadline': self.deadline
+        }
+        if self.bank is not None:
+            message['progress'] = [self.bank.shown_count, self.bank.total_count]
+        if include_words:
+            message['words'] = self.words
+        return message
+
+    def broadcast(self, message):
+        """Encode once and queue on every transport without waiting on any of them"""
+        data = encode(message)
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                self.clients.discard(writer)
+                writer.close()
+            else:
+                writer.write(data)
+
+    def request_start(self):
+        if not self.running:
+            self.start_requested.set()
+
+    def toggle_pause(self):
+        if not self.running:
+            return
+        now = asyncio.get_running_loop().time()
+        if self.paused:
+            self.paused = False
+            self.deadline = now + self.paused_remaining
+        else:
+            self.paused = True
+            self.paused_remaining = max(0, self.deadline - now)
+        self.broadcast(self.state_message())
+        self.changed.set()
+
+    async def handle_client(self, reader, writer):
+        self.clients.add(writer)
+        writer.write(encode(self.state_message(include_words=True)))
+        controller = False
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                kind = message.get('type')
+                if kind == 'ping':
+                    writer.write(encode({'type': 'pong', 'client': message['client'],
+                                         'server': asyncio.get_running_loop().time()}))
+                elif kind == 'hello':
+                    controller = bool(message.get('controller'))
+                elif kind == 'sync':
+                    writer.write(encode(self.state_message(include_words=True)))
+                elif kind == 'start' and controller:
+                    self.request_start()
+                elif kind == 'toggle_pause' and controller:
+                    self.toggle_pause()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def run(self, sessions=None):
+        """Run sessions as the controller starts them; deadlines never drift"""
+        loop = asyncio.get_running_loop()
+        while sessions is None or self.session_id < sessions:
+            await self.start_requested.wait()
+            self.start_requested.clear()
+            self.words = self.next_session_words()
+            if not self.words:
+                continue
+
+            self.session_id += 1
+            self.session_done.clear()
+            self.index = 0
+            self.running = True
+            self.paused = False
+            self.deadline = loop.time() + self.word_duration
+            self.broadcast(self.state_message(include_words=True))
+
+            while self.index < len(self.words):
+                self.changed.clear()
+                if self.paused:
+                    await self.changed.wait()
+                    continue
+                try:
+                    await asyncio.wait_for(self.changed.wait(), max(0, self.deadline - loop.time()))
+                    continue  # Paused or resumed; recompute the wait
+                except asyncio.TimeoutError:
+                    pass
+
+                if self.bank is not None:
+                    self.bank.mark_shown(self.rows[self.index])
+                self.index += 1
+                # Next deadline comes from the schedule, not from when this wake-up ran
+                self.deadline += self.word_duration
+                if self.index < len(self.words):
+                    self.broadcast(self.state_message())
+
+            self.running = False
+            self.deadline = None
+            if self.bank is not None:
+                self.bank.compact()
+            self.broadcast(self.state_message())
+            self.session_done.set()
+
+
+class BroadcastClient:
+    """Connection to a BroadcastServer with clock-offset estimation"""
+
+    def __init__(self, host, port, on_message, controller=False):
+        self.host = host
+        self.port = port
+        self.on_message = on_message
+        self.controller = controller
+        self.writer = None
+        self.offset = 0.0  # Server clock minus local monotonic clock
+        self.pongs = None
+
+    async def connect(self, sync_rounds=5):
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.send({'type': 'hello', 'controller': self.controller})
+        self.reader_task = asyncio.create_task(self._read(reader))
+        await self.sync_clock(sync_rounds)
+        # Ask again now that deadlines can be converted correctly
+        self.send({'type': 'sync'})
+
+    def send(self, message):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(encode(message))
+
+    async def sync_clock(self, rounds):
+        """Keep the offset from the ping with the shortest round trip"""
+        best_rtt = None
+        for _ in range(rounds):
+            self.pongs = asyncio.get_running_loop().create_future()
+            sent = time.monotonic()
+            self.send({'type': 'ping', 'client': sent})
+            pong = await self.pongs
+            received = time.monotonic()
+            rtt = received - sent
+            if best_rtt is None or rtt < best_rtt:
+                best_rtt = rtt
+                self.offset = pong['server'] - (sent + rtt / 2)
+        self.pongs = None
+
+    async def _read(self, reader):
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                if message.get('type') == 'pong':
+                    if self.pongs is not None and not self.pongs.done():
+                        self.pongs.set_result(message)
+                    continue
+                if message.get('deadline') is not None:
+                    message['local_deadline'] = message['deadline'] - self.offset
+                self.on_message(message)
+        except (ConnectionError, ValueError):
+            pass
+        self.on_message({'type': 'disconnected'})
+
+    async def wait_closed(self):
+        await self.reader_task
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class DisplayLink:
+    """Runs a BroadcastClient on a background thread for a pygame display"""
+
+    def __init__(self, host, port, on_message, controller=False, retry_delay=1.0):
+        self.host = host
+        self.port = port
+        self.on_message = on_message
+        self.controller = controller
+        self.retry_delay = retry_delay
+        self.loop = None
+        self.client = None
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name='wat-broadcast', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def send(self, message):
+        if self.loop is not None and self.client is not None:
+            self.loop.call_soon_threadsafe(self.client.send, message)
+
+    def close(self):
+        self.stopping = True
+        if self.loop is not None and self.client is not None:
+            self.loop.call_soon_threadsafe(self.client.close)
+
+    def _run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        # Reconnect until closed; every new connection starts with a snapshot
+        while not self.stopping:
+            self.client = BroadcastClient(self.host, self.port, self.on_message, self.controller)
+            try:
+                await self.client.connect()
+                await self.client.wait_closed()
+            except OSError as e:
+                print(f"Could not reach broadcast server: {e}")
+            if not self.stopping:
+                await asyncio.sleep(self.retry_delay)
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port or DEFAULT_PORT)
+
+
+async def serve(args):
+    # Journal appends and compaction go to a worker thread, so disk work never delays a broadcast
+    writer = BackgroundWriter()
+    bank = WordBank(args.bank, writer=writer)
+    bank.load()
+    server = BroadcastServer(bank=bank, word_duration=args.duration)
+    listener = await asyncio.start_server(server.handle_client, args.host, args.port)
+    print(f"Broadcasting on {args.host}:{args.port}")
+    async with listener:
+        try:
+            await server.run()
+        finally:
+            bank.close()
+            writer.close()
+
+
+async def load_test(args):
+    """Fan one session out to many loopback clients and measure how tightly they flip"""
+    words = [f"WORD{i}" for i in range(args.words)]
+    server = BroadcastServer(words=words, word_duration=args.duration)
+    listener = await asyncio.start_server(server.handle_client, '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    session = asyncio.create_task(server.run(sessions=1))
+
+    arrivals = [{} for _ in range(args.clients)]
+    local_flips = [{} for _ in range(args.clients)]
+    seen = [-1] * args.clients
+
+    def recorder(client_index):
+        def on_message(message):
+            if message.get('type') != 'state' or not message['running']:
+                return
+            if message['index'] > seen[client_index]:
+                seen[client_index] = message['index']
+                arrivals[client_index][message['index']] = time.monotonic()
+                # When this client's screen would flip, from the shared schedule
+                local_flips[client_index][message['index']] = message['local_deadline'] - message['duration']
+        return on_message
+
+    clients = [BroadcastClient('127.0.0.1', port, recorder(i)) for i in range(args.clients)]
+    await asyncio.gather(*(client.connect() for client in clients))
+
+    server.request_start()
+    await session
+    for client in clients:
+        client.close()
+    await asyncio.gather(*(client.wait_closed() for client in clients))
+    # Let the server's handlers see every disconnect before the loop shuts down
+    while server.clients:
+        await asyncio.sleep(0.01)
+    listener.close()
+    await listener.wait_closed()
+
+    def summarise(per_client):
+        spreads = []
+        for index in range(args.words):
+            times = [flips[index] for flips in per_client if index in flips]
+            if len(times) > 1:
+                spreads.append(max(times) - min(times))
+        if not spreads:
+            return "n/a (needs two clients seeing the same flip)"
+        spreads.sort()
+        p99 = spreads[min(len(spreads) - 1, math.ceil(0.99 * len(spreads)) - 1)]
+        return "median {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms".format(
+            statistics.median(spreads) * 1000, p99 * 1000, spreads[-1] * 1000)
+
+    print(f"{args.clients} clients, {args.words} flips of {args.duration}s")
+    print(f"message arrival spread:  {summarise(arrivals)}")
+    print(f"scheduled flip spread:   {summarise(local_flips)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast one WAT session to many displays")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="run the authoritative session server")
+    serve_parser.add_argument('--bank', nargs='+', default=['wat.csv'], metavar='CSV')
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--duration', type=float, default=17, help="seconds per word")
+
+    test_parser = commands.add_parser('loadtest', help="simulate many clients on loopback")
+    test_parser.add_argument('--clients', type=int, default=200)
+    test_parser.add_argument('--words', type=int, default=10)
+    test_parser.add_argument('--duration', type=float, default=0.5, help="seconds per word")
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == 'serve' else load_test(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
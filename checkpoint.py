@@ -0,0 +1,50 @@
+import os
+import pickle
+
+CHECKPOINT_VERSION = 1
+
+
+class SessionCheckpoint:
+    """Position of the running session, kept on disk so a crash can resume it
+
+    The app saves a small dict on each word flip and pause: the session's
+    rows and words, the current index, the time left on that word and the
+    typed-response session id. Writes go to the background writer as a
+    temp file, fsync and rename. The main thread only queues the dict, and
+    a crash mid-write leaves the previous checkpoint intact. The file is
+    removed when a session completes or the app quits normally."""
+
+    def __init__(self, path, writer):
+        self.path = path
+        self.writer = writer
+
+    def save(self, state):
+        self.writer.submit(self._write, state)
+
+    def clear(self):
+        self.writer.submit(self._remove)
+
+    def load(self):
+        """The saved state, or None if there is none or it cannot be read"""
+        try:
+            with open(self.path, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+            return None
+        return state
+
+    def _write(self, state):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump(dict(state, version=CHECKPOINT_VERSION), file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
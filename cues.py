@@ -0,0 +1,73 @@
+import os
+import zlib
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Each cue is a list of (frequency Hz, start s, duration s, volume) notes
+CUES = {
+    'session_start': [(660, 0.0, 0.25, 0.5), (880, 0.12, 0.35, 0.5)],
+    'word_change': [(880, 0.0, 0.3, 0.6)],
+    'pause': [(440, 0.0, 0.2, 0.5)],
+    'last_three': [(1200, 0.0, 0.06, 0.35)]
+}
+
+# Quieter overtones give the word-change cue a bell-like ring
+PARTIALS = [(1.0, 1.0), (2.0, 0.35), (3.0, 0.15)]
+
+
+def synthesize(name, frequency, size, channels):
+    """Render a cue as raw PCM bytes in the given mixer format"""
+    if np is None:
+        raise RuntimeError("NumPy is needed to synthesise cue sounds")
+
+    notes = CUES[name]
+    length = int(max(start + duration for _, start, duration, _ in notes) * frequency)
+    wave = np.zeros(length, dtype=np.float32)
+
+    for note_frequency, start, duration, volume in notes:
+        first = int(start * frequency)
+        t = np.arange(int(duration * frequency), dtype=np.float32) / frequency
+        tone = sum(weight * np.sin(2 * np.pi * note_frequency * ratio * t) for ratio, weight in PARTIALS)
+        # 5 ms attack, exponential decay, so the cue starts cleanly and never clicks
+        envelope = np.minimum(1.0, t / 0.005) * np.exp(-t * 6.0 / duration)
+        segment = wave[first:first + len(t)]
+        segment += (volume * tone * envelope)[:len(segment)]
+
+    wave = np.clip(wave, -1.0, 1.0)
+    if size == 32:
+        samples = wave.astype(np.float32)
+    elif size == -16:
+        samples = (wave * 32767).astype(np.int16)
+    elif size == 16:
+        samples = ((wave + 1.0) * 32767.5).astype(np.uint16)
+    elif size == -8:
+        samples = (wave * 127).astype(np.int8)
+    elif size == 8:
+        samples = ((wave + 1.0) * 127.5).astype(np.uint8)
+    else:
+        samples = (wave * 2147483647).astype(np.int32)
+
+    # Interleave the same signal into every channel
+    return np.repeat(samples[:, None], channels, axis=1).tobytes()
+
+
+def load_cue(name, cache_dir):
+    """Build a cue Sound for the current mixer, reusing PCM cached on disk"""
+    frequency, size, channels = pygame.mixer.get_init()
+    # Editing a cue's notes changes its checksum, so stale PCM is never reused
+    checksum = zlib.crc32(repr((CUES[name], PARTIALS)).encode('utf-8'))
+    path = os.path.join(cache_dir, f"{name}-{checksum:08x}-{frequency}-{size}-{channels}.pcm")
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        data = synthesize(name, frequency, size, channels)
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+    return pygame.mixer.Sound(buffer=data)
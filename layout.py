@@ -0,0 +1,118 @@
+from collections import OrderedDict
+
+import pygame
+
+SIZE_STEP = 0.9  # Each smaller candidate size is about 10% below the last
+LINE_SPACING = 1.4  # Stacked lines advance by this many line heights
+
+
+class FontPool:
+    """Loaded fonts by pixel size; the least recently used is dropped past max_fonts"""
+
+    def __init__(self, path=None, max_fonts=8):
+        self.path = path
+        self.max_fonts = max_fonts
+        self.fonts = OrderedDict()
+
+    def get(self, size):
+        font = self.fonts.get(size)
+        if font is not None:
+            self.fonts.move_to_end(size)
+            return font
+        font = pygame.font.Font(self.path, size)
+        self.fonts[size] = font
+        if len(self.fonts) > self.max_fonts:
+            self.fonts.popitem(last=False)
+        return font
+
+
+class TextLayout:
+    """Largest font size at which a line fits the screen width
+
+    Sizes come from a short ladder below each maximum, so a screen uses
+    only a few distinct fonts. The last size found for each (maximum,
+    text length) is remembered and used as the starting point for the
+    next text of that length. Texts of equal length are usually about as
+    wide, so fitting a new word takes one or two measurements. plan()
+    fits a whole session's words up front, leaving only a dict lookup
+    per flip. A layout belongs to one resolution; a new screen size
+    needs a new layout."""
+
+    def __init__(self, max_width, min_size, pool=None):
+        self.max_width = max_width
+        self.min_size = min_size
+        self.pool = pool or FontPool()
+        self.ladders = {}
+        self.hints = {}
+        self.planned = {}
+
+    def ladder(self, max_size):
+        sizes = self.ladders.get(max_size)
+        if sizes is None:
+            sizes = [max_size]
+            while int(sizes[-1] * SIZE_STEP) >= self.min_size:
+                sizes.append(int(sizes[-1] * SIZE_STEP))
+            self.ladders[max_size] = sizes
+        return sizes
+
+    def fits(self, text, size):
+        return self.pool.get(size).size(text)[0] <= self.max_width
+
+    def fit(self, text, max_size):
+        """Largest ladder size at or below max_size that fits, or the smallest if none does"""
+        size = self.planned.get((max_size, text))
+        if size is not None:
+            return size
+        sizes = self.ladder(max_size)
+        key = (max_size, len(text))
+        index = self.hints.get(key, 0)
+        if self.fits(text, sizes[index]):
+            while index > 0 and self.fits(text, sizes[index - 1]):
+                index -= 1
+        else:
+            while index + 1 < len(sizes):
+                index += 1
+                if self.fits(text, sizes[index]):
+                    break
+        self.hints[key] = index
+        return sizes[index]
+
+    def font(self, text, max_size):
+        return self.pool.get(self.fit(text, max_size))
+
+    def plan(self, texts, max_size):
+        """Fit every text ahead of time, replacing the previous plan"""
+        self.planned = {}
+        self.planned = {(max_size, text): self.fit(text, max_size) for text in texts}
+        return self.planned
+
+    def stack(self, lines, top, bottom):
+        """Centre lines of (text, max_size) between top and bottom; returns (text, font, y) per line
+
+        Empty lines add one line of space. If the block is too tall,
+        every size is scaled down once to make it fit."""
+        placed = self._place(lines)
+        height = sum(step for _, _, step in placed)
+        if height > bottom - top:
+            scale = (bottom - top) / height
+            lines = [(text, max(self.min_size, int(max_size * scale))) for text, max_size in lines]
+            placed = self._place(lines)
+            height = sum(step for _, _, step in placed)
+
+        y = top + max(0, (bottom - top - height) // 2)
+        positions = []
+        for text, font, step in placed:
+            if text:
+                positions.append((text, font, y))
+            y += step
+        return positions
+
+    def _place(self, lines):
+        placed = []
+        for text, max_size in lines:
+            if text:
+                font = self.font(text, max_size)
+                placed.append((text, font, int(font.get_linesize() * LINE_SPACING)))
+            else:
+                placed.append((text, None, self.pool.get(max_size).get_linesize()))
+        return placed
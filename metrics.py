@@ -0,0 +1,219 @@
+"""Per-session timing metrics for the main loop, written as JSON lines.
+
+    python wat.py --metrics                 # appends to wat_metrics.jsonl
+    python wat.py --metrics run.jsonl --profile
+
+Each finished (or quit) session adds one line: frame-time and flip-lateness
+histograms, how far flips drifted from the ideal word_duration grid, how
+long bank and database calls blocked the main loop, and how long each job
+took on the background writer. F9 starts and stops cProfile; a session
+that was profiled also leaves a .prof file for pstats or snakeviz.
+"""
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from array import array
+
+SUB_BUCKETS = 8  # Linear buckets per power of two, so values land within 12.5% of their bucket
+
+
+def bucket_index(micros):
+    shift = max(0, micros.bit_length() - 4)
+    return shift * SUB_BUCKETS + (micros >> shift)
+
+
+def bucket_floor(index):
+    """Smallest microsecond value that falls in a bucket"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return (index - shift * SUB_BUCKETS) << shift
+
+
+class Histogram:
+    """Log-linear histogram of durations in whole microseconds
+
+    Recording is an index computation and an increment, so it can sit in
+    the frame loop. Negative durations count as zero."""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = array('I')
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, seconds):
+        micros = int(seconds * 1000000) if seconds > 0 else 0
+        index = bucket_index(micros)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += micros
+        if micros > self.max:
+            self.max = micros
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket holding the given fraction of values, in microseconds"""
+        if not self.count:
+            return 0
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_floor(index + 1) - 1, self.max)
+        return self.max
+
+    def summary(self):
+        """Milliseconds, plus the non-empty buckets keyed by their lower edge in microseconds"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count / 1000, 3),
+            'p50_ms': self.percentile(0.5) / 1000,
+            'p90_ms': self.percentile(0.9) / 1000,
+            'p99_ms': self.percentile(0.99) / 1000,
+            'max_ms': self.max / 1000,
+            'buckets_us': {bucket_floor(index): count for index, count in enumerate(self.counts) if count}
+        }
+
+
+def append_record(path, record):
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+class Metrics:
+    """Collects one session's timings; the app keeps None here when metrics are off
+
+    Frame and I/O timings use perf_counter. Flip timings use the app's
+    session clock, so simulated sessions report their virtual timeline."""
+
+    def __init__(self, path, writer, profile=False):
+        self.path = path
+        self.writer = writer
+        self.session = 0
+        self.profiler = None
+        self.profiled = False
+        self.lock = threading.Lock()  # writer_jobs is filled on the writer thread
+        self.writer_jobs = {}
+        self.reset()
+        if profile:
+            self.toggle_profile()
+
+    def reset(self):
+        self.started = time.time()
+        self.frames = Histogram()
+        self.flip_lateness = Histogram()
+        self.io = {}
+        self.session_start = None
+        self.paused_total = 0.0
+        self.pause_started = None
+        self.grid_drift = 0.0
+        self.worst_grid_drift = 0.0
+        self.flips = 0
+
+    def begin_session(self, now, flips=0):
+        """Start a new record; anything measured before the session is dropped
+
+        A resumed session passes its first word's start and the words
+        already flipped, so drift is still measured against the whole grid."""
+        self.reset()
+        self.session += 1
+        self.session_start = now
+        self.flips = flips
+        with self.lock:
+            self.writer_jobs = {}
+
+    def record_frame(self, seconds):
+        self.frames.record(seconds)
+
+    def record_io(self, name, seconds):
+        histogram = self.io.get(name)
+        if histogram is None:
+            histogram = self.io[name] = Histogram()
+        histogram.record(seconds)
+
+    def record_writer_job(self, name, seconds):
+        with self.lock:
+            histogram = self.writer_jobs.get(name)
+            if histogram is None:
+                histogram = self.writer_jobs[name] = Histogram()
+            histogram.record(seconds)
+
+    def pause(self, now):
+        if self.session_start is not None:
+            self.pause_started = now
+
+    def resume(self, now):
+        if self.pause_started is not None:
+            self.paused_total += now - self.pause_started
+            self.pause_started = None
+
+    def record_flip(self, now, deadline, duration):
+        """Note a word leaving the screen at now; deadline is when it was due to"""
+        if self.session_start is None:
+            return
+        self.flips += 1
+        self.flip_lateness.record(now - deadline)
+        # Where the flip falls against start + pauses + n whole words
+        ideal = self.session_start + self.paused_total + self.flips * duration
+        self.grid_drift = now - ideal
+        self.worst_grid_drift = max(self.worst_grid_drift, abs(self.grid_drift))
+
+    def toggle_profile(self):
+        """Start or stop cProfile; returns True while profiling"""
+        if self.profiled:
+            self.profiler.disable()
+            self.profiled = False
+        else:
+            if self.profiler is None:
+                self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            self.profiled = True
+        return self.profiled
+
+    def end_session(self, now, words, completed=True, **extra):
+        """Queue this session's record, and its profile if one ran, on the writer thread"""
+        record = {
+            'session': self.session,
+            'started': round(self.started, 3),
+            'completed': completed,
+            'words': words,
+            'flips': self.flips,
+            'session_s': None if self.session_start is None else round(now - self.session_start, 6),
+            'paused_s': round(self.paused_total, 6),
+            'grid_drift_ms': round(self.grid_drift * 1000, 3),
+            'worst_grid_drift_ms': round(self.worst_grid_drift * 1000, 3),
+            'frame': self.frames.summary(),
+            'flip_lateness': self.flip_lateness.summary(),
+            'io': {name: histogram.summary() for name, histogram in self.io.items()}
+        }
+        record.update(extra)
+        with self.lock:
+            record['writer'] = {name: histogram.summary() for name, histogram in self.writer_jobs.items()}
+            self.writer_jobs = {}
+
+        if self.profiler is not None:
+            # Collecting the stats is quick; writing them is left to the writer.
+            # A profile still running carries on into the next session with a fresh profiler
+            profiling = self.profiled
+            if profiling:
+                self.toggle_profile()
+            stats = pstats.Stats(self.profiler)
+            profile_path = f"{os.path.splitext(self.path)[0]}-{int(self.started)}-{self.session}.prof"
+            record['profile'] = profile_path
+            self.writer.submit(stats.dump_stats, profile_path)
+            self.profiler = None
+            if profiling:
+                self.toggle_profile()
+
+        self.writer.submit(append_record, self.path, record)
+        self.session_start = None
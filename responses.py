@@ -0,0 +1,100 @@
+import sqlite3
+import time
+from array import array
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    banks TEXT NOT NULL,
+    word_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS responses (
+    session_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    response TEXT NOT NULL,
+    first_key_ms INTEGER,
+    last_key_ms INTEGER,
+    keystrokes BLOB NOT NULL,
+    PRIMARY KEY (session_id, position)
+) WITHOUT ROWID;
+"""
+
+
+class ResponseStore:
+    """Typed responses and keystroke timings in a SQLite database
+
+    Rows are buffered in memory and written in batches by the background
+    writer, so the render thread never waits on the database. The
+    connection is opened and used only on the writer thread, and WAL mode
+    lets analysis read the database while a session is writing to it.
+    Keystroke timings are ms of word time (pauses excluded) packed into an
+    array('I') blob."""
+
+    def __init__(self, path, writer, batch_size=20):
+        self.path = path
+        self.writer = writer
+        self.batch_size = batch_size
+        self.connection = None
+        self.session_id = None
+        self.pending_sessions = []
+        self.pending_responses = []
+
+    def begin_session(self, banks, word_count):
+        # Microsecond start time doubles as the id, so no database round trip is needed
+        self.session_id = time.time_ns() // 1000
+        self.pending_sessions.append((self.session_id, time.time(), ','.join(banks), word_count))
+
+    def resume_session(self, session_id, banks, word_count):
+        """Carry on writing to a session begun before a restart"""
+        self.session_id = session_id
+        self.pending_sessions.append((session_id, session_id / 1000000, ','.join(banks), word_count))
+
+    def add(self, position, word, response, keystrokes):
+        """Queue one word's response; a full batch goes to the writer"""
+        first_key = keystrokes[0] if keystrokes else None
+        last_key = keystrokes[-1] if keystrokes else None
+        self.pending_responses.append((self.session_id, position, word, response,
+                                       first_key, last_key, keystrokes.tobytes()))
+        if len(self.pending_responses) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Hand everything queued so far to the writer as one transaction"""
+        if self.pending_sessions or self.pending_responses:
+            self.writer.submit(self._write_batch, self.pending_sessions, self.pending_responses)
+            self.pending_sessions = []
+            self.pending_responses = []
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # WAL with NORMAL sync survives application crashes; only a power cut can lose the last batch
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _write_batch(self, sessions, responses):
+        if self.connection is None:
+            self.connection = self._connect()
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)', sessions)
+            self.connection.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        responses)
+
+    def close(self):
+        """Queue the last batch, then close the connection on the writer thread"""
+        self.flush()
+        self.writer.submit(self._close)
+
+    def _close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def read_keystrokes(blob):
+    keystrokes = array('I')
+    keystrokes.frombytes(blob)
+    return keystrokes
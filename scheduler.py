@@ -0,0 +1,220 @@
+import heapq
+import os
+import pickle
+import random
+from array import array
+
+POLICIES = ['sequential', 'due', 'priority', 'random']
+
+MAX_PRIORITY = 255
+MAX_INTERVAL = 64  # Sessions between repeats of a well-known word
+ROW_BITS = 32
+ROW_MASK = (1 << ROW_BITS) - 1
+
+
+class SequentialScheduler:
+    """Next unshown words in bank order, cycling once every word is shown"""
+
+    def __init__(self, bank):
+        self.bank = bank
+
+    def select(self, limit):
+        return self.bank.unshown_rows(limit)
+
+    def record_shown(self, row):
+        pass
+
+    def boost(self, row):
+        pass
+
+    def snapshot(self):
+        return None
+
+    def apply_splice(self, splice):
+        pass
+
+
+class HeapScheduler:
+    """Spaced-repetition selection from a heap of packed integer keys
+
+    Per-word state is three arrays (due session, repeat interval, priority).
+    Each heap entry is a single int with the row in its low bits, so the heap
+    stays small. Entries go stale when a word's state changes. A popped entry
+    is used only if it still matches the word's current key, so picking k
+    words costs O(k log n) amortised."""
+
+    def __init__(self, bank, policy='due', seed=None, state_path=None):
+        if policy not in POLICIES[1:]:
+            raise ValueError(f"Unknown schedule policy: {policy}")
+        self.bank = bank
+        self.policy = policy
+        self.seed = seed
+        self.state_path = state_path
+        self.session = 0
+        self.due = array('I')
+        self.interval = array('B')
+        self.priority = array('B')
+        self.rank = None
+        self.heap = None
+        self.heap_stale = False  # Rows moved under the heap's entries; rebuilt at the next select
+        self.pending = set()  # Rows handed out by select whose state has not changed yet
+        self.boosted = set()  # Rows boosted since the last select keep their priority when shown
+
+    def _build(self):
+        size = self.bank.total_count
+        self.due = array('I', bytes(4 * size))
+        self.interval = array('B', bytes(size))
+        self.priority = array('B', bytes(size))
+        if self.policy == 'random':
+            order = list(range(size))
+            random.Random(self.seed).shuffle(order)
+            self.rank = array('I', order)
+        self.load()
+        self.heap = [self._key(row) for row in range(size)]
+        heapq.heapify(self.heap)
+
+    def _key(self, row):
+        urgency = MAX_PRIORITY - self.priority[row]
+        if self.policy == 'priority':
+            first, second, third = urgency, self.due[row], 0
+        elif self.policy == 'random':
+            first, second, third = self.due[row], urgency, self.rank[row]
+        else:
+            first, second, third = self.due[row], urgency, 0
+        return (((first << ROW_BITS | second) << ROW_BITS | third) << ROW_BITS) | row
+
+    def _push(self, row):
+        self.pending.discard(row)
+        heapq.heappush(self.heap, self._key(row))
+
+    def select(self, limit):
+        """Pop the limit most urgent words"""
+        if self.heap is None:
+            self._build()
+        elif self.heap_stale:
+            self.heap = [self._key(row) for row in range(len(self.due)) if row not in self.pending]
+            heapq.heapify(self.heap)
+            self.heap_stale = False
+        self.session += 1
+        self.boosted = set()
+
+        # Words from an abandoned session go back in with their old key
+        for row in self.pending:
+            heapq.heappush(self.heap, self._key(row))
+        self.pending = set()
+
+        rows = []
+        while self.heap and len(rows) < limit:
+            key = heapq.heappop(self.heap)
+            row = key & ROW_MASK
+            if row < len(self.due) and key == self._key(row) and row not in self.pending:
+                rows.append(row)
+                self.pending.add(row)
+        return rows
+
+    def record_shown(self, row):
+        """Push a shown word back, due again after a growing interval"""
+        if self.heap is None or row is None or row >= len(self.due):
+            return
+        self.interval[row] = min(MAX_INTERVAL, max(1, self.interval[row] * 2))
+        self.due[row] = self.session + self.interval[row]
+        if row not in self.boosted:
+            self.priority[row] = max(0, self.priority[row] - 1)
+        self._push(row)
+
+    def boost(self, row):
+        """Raise a word paused or quit on, so it comes back next session"""
+        if self.heap is None or row is None or row >= len(self.due):
+            return
+        self.priority[row] = min(MAX_PRIORITY, self.priority[row] + 1)
+        self.interval[row] = 0
+        self.due[row] = 0
+        self.boosted.add(row)
+        self._push(row)
+
+    def apply_splice(self, splice):
+        """Follow a hot-reloaded edit, keeping the state of words that survived it"""
+        if self.heap is None:
+            return
+        carried = {word: offset for offset, word in enumerate(splice.old_words)}
+        sources = [carried.get(word) for word in splice.rows_by_word]
+        for name in ('due', 'interval', 'priority', 'rank'):
+            column = getattr(self, name)
+            if column is None:
+                continue
+            old = column[splice.start:splice.end]
+            if name == 'rank':
+                # New words get ranks after every existing one
+                fresh = iter(range(len(column), len(column) + len(sources)))
+                values = [next(fresh) if offset is None else old[offset] for offset in sources]
+            else:
+                values = [0 if offset is None else old[offset] for offset in sources]
+            column[splice.start:splice.end] = array(column.typecode, values)
+
+        old_words = splice.old_words
+        def remap(rows):
+            moved = (splice.remap(row, old_words[row - splice.start] if splice.start <= row < splice.end else None)
+                     for row in rows)
+            return {row for row in moved if row is not None}
+        self.pending = remap(self.pending)
+        self.boosted = remap(self.boosted)
+        if splice.shift:
+            # Later rows moved, so every entry's packed row is off; re-key them at the next select
+            self.heap_stale = True
+        elif not self.heap_stale:
+            # Rows stayed put: entries left for replaced words fail the key check when popped
+            for row in range(splice.start, splice.end):
+                if row not in self.pending:
+                    heapq.heappush(self.heap, self._key(row))
+
+    def snapshot(self):
+        """Copy the per-word state so it can be written off the main thread
+
+        The words are copied too: a hot reload may move rows before the
+        writer gets to the snapshot."""
+        if self.state_path is None or self.heap is None:
+            return None
+        return (self.session, list(self.bank.words), array('I', self.due), bytes(self.interval),
+                bytes(self.priority))
+
+    def write_state(self, snapshot):
+        """Save the state of words that have been scheduled at least once"""
+        session, words, due, interval, priority = snapshot
+        rows = [row for row in range(len(due)) if due[row] or priority[row]]
+        data = {
+            'session': session,
+            'words': [words[row] for row in rows],
+            'due': array('I', (due[row] for row in rows)).tobytes(),
+            'interval': bytes(interval[row] for row in rows),
+            'priority': bytes(priority[row] for row in rows)
+        }
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.state_path)
+
+    def load(self):
+        """Restore saved state by word, so edits to the bank do not misalign it"""
+        if self.state_path is None:
+            return
+        try:
+            with open(self.state_path, 'rb') as file:
+                data = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+
+        row_of_word = {word: row for row, word in enumerate(self.bank.words)}
+        due = array('I', data['due'])
+        self.session = data['session']
+        for i, word in enumerate(data['words']):
+            row = row_of_word.get(word)
+            if row is not None:
+                self.due[row] = due[i]
+                self.interval[row] = data['interval'][i]
+                self.priority[row] = data['priority'][i]
+
+
+def create_scheduler(policy, bank, seed=None, state_path=None):
+    if policy == 'sequential':
+        return SequentialScheduler(bank)
+    return HeapScheduler(bank, policy, seed, state_path)
@@ -0,0 +1,280 @@
+"""Batch scoring of typed responses against each word's best_response.
+
+Reads sessions recorded with `wat.py --type-responses` and scores every
+response: TF-IDF cosine similarity to the bank's best response, length,
+typing times and the share of positive words. Results go to a columnar
+.npz file with one array per column:
+
+    python scoring.py --db wat_responses.db --bank wat.csv "wat.csv - set2.csv" "wat.csv - set3(final).csv"
+    python scoring.py --workers 8 --output cohort.npz
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from wordbank import CACHE_DIR, WordBank
+
+INDEX_VERSION = 2
+TOKEN = re.compile(r"[a-z']+")
+KEYSTROKE_SIZE = array('I').itemsize
+
+POSITIVE_WORDS = frozenset("""
+able accept achieve active adapt aim ambition best brave build calm care cheerful
+clear commit confident cooperate courage create dedicate determined disciplined
+duty eager effort empower encourage energy enjoy enthusiasm excel faith fair focus
+friend generous goal good grow happy help honest hope improve initiative inspire
+integrity joy kind lead learn love loyal motivate optimistic overcome patient
+peace persevere persist plan positive proud purpose ready resilient respect
+responsible serve share smile solve strength strong succeed success support
+team thank trust truth unite value victory willing win wisdom
+""".split())
+
+# Columns of the output file, in order, with their dtypes
+COLUMNS = [
+    ('session_id', 'int64'),
+    ('position', 'uint8'),
+    ('reference', 'int32'),  # Row in reference_words, or -1 if the word is in no bank
+    ('similarity', 'float32'),
+    ('word_count', 'uint16'),
+    ('char_count', 'uint16'),
+    ('positive_ratio', 'float32'),
+    ('keystroke_count', 'uint16'),
+    ('first_key_ms', 'int32'),  # -1 when nothing was typed
+    ('last_key_ms', 'int32')
+]
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+class ReferenceIndex:
+    """TF-IDF vectors of every best_response, built once per set of banks
+
+    Vectors are L2-normalised rows of a sparse matrix over the reference
+    vocabulary, stored as CSR arrays (indptr, indices, data) with sorted
+    columns. A reference has only a handful of terms, so this stays small
+    enough to copy into every worker. One extra column, never set in the
+    references, holds words that appear only in responses. They still
+    count towards a response's norm, so padding an answer lowers its score."""
+
+    def __init__(self, words, vocabulary, idf, indptr, indices, data):
+        self.words = words
+        self.row_of_word = {word: row for row, word in enumerate(words)}
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        # One sorted row * width + column key per stored value, for looking values up by pair
+        width = len(idf)
+        self.keys = np.repeat(np.arange(len(words), dtype=np.int64), np.diff(indptr)) * width + indices
+
+    @classmethod
+    def build(cls, words, responses):
+        documents = [tokenize(response) for response in responses]
+        vocabulary = {}
+        for tokens in documents:
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
+
+        rows, columns = flatten(documents, vocabulary)
+        width = len(vocabulary) + 1
+        # Smoothed IDF; the out-of-vocabulary column gets the rarest possible weight
+        pairs, counts = np.unique(rows * width + columns, return_counts=True)
+        pair_rows = pairs // width
+        pair_columns = pairs % width
+        document_frequency = np.bincount(pair_columns, minlength=width)
+        idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        # Pairs come out of np.unique sorted by row, then column: already in CSR order
+        weights = counts * idf[pair_columns]
+        norms = np.sqrt(np.bincount(pair_rows, weights * weights, minlength=len(documents)))
+        data = (weights / norms[pair_rows]).astype(np.float32)
+        indptr = np.zeros(len(documents) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_rows, minlength=len(documents)), out=indptr[1:])
+        return cls(words, vocabulary, idf, indptr, pair_columns.astype(np.int32), data)
+
+    @classmethod
+    def load(cls, bank_paths):
+        """Index for the banks' best responses, cached on disk by their content"""
+        bank = WordBank(bank_paths)
+        bank.load(replay=False)
+        digest = hashlib.sha1()
+        for word, response in zip(bank.words, bank.responses):
+            digest.update(f"{word}\0{response}\0".encode('utf-8'))
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(bank.paths[0])), CACHE_DIR)
+        cache_path = os.path.join(cache_dir, f"index-{INDEX_VERSION}-{digest.hexdigest()[:16]}.npz")
+
+        try:
+            with np.load(cache_path, allow_pickle=False) as data:
+                vocabulary = {token: column for column, token in enumerate(data['vocabulary'].tolist())}
+                return cls(bank.words, vocabulary, data['idf'], data['indptr'], data['indices'], data['data'])
+        except (OSError, KeyError, ValueError):
+            pass
+
+        index = cls.build(bank.words, bank.responses)
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            np.savez(file, vocabulary=np.array(list(index.vocabulary), dtype=str), idf=index.idf,
+                     indptr=index.indptr, indices=index.indices, data=index.data)
+        os.replace(temp_path, cache_path)
+        return index
+
+    def values(self, rows, columns):
+        """Stored values at (row, column) pairs, 0 where the reference lacks the term"""
+        keys = rows * len(self.idf) + columns
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.float32)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, self.data[positions], 0)
+
+
+def flatten(documents, vocabulary):
+    """Token lists to parallel (document, column) arrays; unknown tokens share the last column"""
+    unknown = len(vocabulary)
+    rows = []
+    columns = []
+    for row, tokens in enumerate(documents):
+        rows.extend([row] * len(tokens))
+        columns.extend([vocabulary.get(token, unknown) for token in tokens])
+    return np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)
+
+
+def score_batch(index, batch):
+    """Score (session_id, position, word, response, first, last, keystrokes) rows in one pass"""
+    count = len(batch)
+    documents = [tokenize(row[3]) for row in batch]
+    rows, columns = flatten(documents, index.vocabulary)
+    references = np.array([index.row_of_word.get(row[2], -1) for row in batch], dtype=np.int32)
+
+    # Sparse dot products: sum each distinct (response, token) pair's weight once
+    width = len(index.idf)
+    pairs, counts = np.unique(rows * width + columns, return_counts=True)
+    pair_rows = pairs // width
+    pair_columns = pairs % width
+    weights = counts * index.idf[pair_columns]
+    norms = np.sqrt(np.bincount(pair_rows, weights * weights, minlength=count))
+    matched = references[pair_rows] >= 0
+    reference_values = index.values(references[pair_rows[matched]].astype(np.int64), pair_columns[matched])
+    dots = np.bincount(pair_rows[matched], weights[matched] * reference_values, minlength=count)
+    similarity = np.divide(dots, norms, out=np.zeros(count), where=norms > 0)
+
+    positive = np.array([sum(token in POSITIVE_WORDS for token in tokens) for tokens in documents],
+                        dtype=np.float32)
+    word_counts = np.array([len(tokens) for tokens in documents], dtype=np.float32)
+    keystroke_counts = [len(row[6]) // KEYSTROKE_SIZE for row in batch]
+
+    return {
+        'session_id': np.array([row[0] for row in batch], dtype=np.int64),
+        'position': np.array([row[1] for row in batch], dtype=np.uint8),
+        'reference': references,
+        'similarity': similarity.astype(np.float32),
+        'word_count': word_counts.astype(np.uint16),
+        'char_count': np.array([min(len(row[3]), 65535) for row in batch], dtype=np.uint16),
+        'positive_ratio': np.divide(positive, word_counts, out=np.zeros(count, dtype=np.float32),
+                                    where=word_counts > 0),
+        'keystroke_count': np.array(keystroke_counts, dtype=np.uint16),
+        'first_key_ms': np.array([-1 if row[4] is None else row[4] for row in batch], dtype=np.int32),
+        'last_key_ms': np.array([-1 if row[5] is None else row[5] for row in batch], dtype=np.int32)
+    }
+
+
+# Worker process state, set once by the pool initializer
+worker_index = None
+worker_db = None
+
+
+def init_worker(index, db_path):
+    global worker_index, worker_db
+    worker_index = index
+    worker_db = db_path
+
+
+def score_sessions(session_range):
+    """Score every response of the sessions with ids in [first, last]"""
+    first, last = session_range
+    connection = sqlite3.connect(f"file:{worker_db}?mode=ro", uri=True)
+    try:
+        batch = connection.execute(
+            'SELECT session_id, position, word, response, first_key_ms, last_key_ms, keystrokes '
+            'FROM responses WHERE session_id BETWEEN ? AND ? ORDER BY session_id, position',
+            (first, last)).fetchall()
+    finally:
+        connection.close()
+    return score_batch(worker_index, batch)
+
+
+def session_ranges(db_path, sessions_per_task):
+    """Split session ids into contiguous id ranges for the workers"""
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        ids = [row[0] for row in connection.execute('SELECT id FROM sessions ORDER BY id')]
+    finally:
+        connection.close()
+    ranges = [(ids[i], ids[min(i + sessions_per_task, len(ids)) - 1])
+              for i in range(0, len(ids), sessions_per_task)]
+    return ids, ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score recorded responses against best_response")
+    parser.add_argument('--db', default='wat_responses.db', help="responses database (default wat_responses.db)")
+    parser.add_argument('--bank', nargs='+', default=['wat.csv'], metavar='CSV',
+                        help="bank(s) holding the reference responses")
+    parser.add_argument('--output', default='scores.npz', help="columnar output file (default scores.npz)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--sessions-per-task', type=int, default=200, metavar='N',
+                        help="sessions each worker scores per task")
+    args = parser.parse_args()
+
+    if np is None:
+        print("NumPy is needed for scoring: pip install numpy")
+        return 1
+    if not os.path.exists(args.db):
+        print(f"No responses database at {args.db}")
+        return 1
+
+    start = time.perf_counter()
+    index = ReferenceIndex.load(args.bank)
+    index_seconds = time.perf_counter() - start
+
+    ids, ranges = session_ranges(args.db, args.sessions_per_task)
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(index, args.db)) as pool:
+        for result in pool.map(score_sessions, ranges):
+            results.append(result)
+
+    columns = {name: np.concatenate([result[name] for result in results]) if results
+               else np.zeros(0, dtype=dtype) for name, dtype in COLUMNS}
+    temp_path = args.output + '.tmp'
+    with open(temp_path, 'wb') as file:
+        np.savez(file, reference_words=np.array(index.words, dtype=str), **columns)
+    os.replace(temp_path, args.output)
+
+    seconds = time.perf_counter() - start
+    responses = len(columns['session_id'])
+    print(f"Reference index: {len(index.words)} words, {len(index.vocabulary)} terms in {index_seconds * 1000:.0f} ms")
+    print(f"Scored {len(ids)} sessions ({responses} responses) in {seconds:.2f} s: "
+          f"{len(ids) / seconds:.0f} sessions/s, {responses / seconds:.0f} responses/s")
+    if responses:
+        print(f"Mean similarity {columns['similarity'].mean():.3f}, "
+              f"mean positive ratio {columns['positive_ratio'].mean():.3f}")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
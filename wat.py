@@ -1,19 +1,23 @@
 import pygame
+import argparse
 import csv
 import sys
 import time
+import math
 import os
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-# Initialize Pygame
-pygame.init()
-
-# Initialize mixer for sound
-pygame.mixer.init()
-
-# Get fullscreen resolution
-info = pygame.display.Info()
-SCREEN_WIDTH = info.current_w
-SCREEN_HEIGHT = info.current_h
+from broadcast import DisplayLink, parse_address
+from checkpoint import SessionCheckpoint
+from cues import CUES, load_cue
+from layout import FontPool, TextLayout
+from metrics import Metrics
+from responses import ResponseStore
+from scheduler import POLICIES, create_scheduler
+from watcher import BankWatcher
+from wordbank import CACHE_DIR, BackgroundWriter, WordBank, WordRecord
 
 # Colors
 BLACK = (0, 0, 0)
@@ -25,31 +29,168 @@ BLUE = (100, 150, 255)
 
 # Font settings (scaled for fullscreen)
 BASE_FONT_SIZE = 80
-TIMER_FONT_SIZE = 48
-INSTRUCTION_FONT_SIZE = 28
-SMALL_FONT_SIZE = 20
+BASE_TIMER_FONT_SIZE = 48
+BASE_INSTRUCTION_FONT_SIZE = 28
+BASE_SMALL_FONT_SIZE = 20
+
+# Screen and scaled font sizes, filled in by init_display()
+SCREEN_WIDTH = 1024
+SCREEN_HEIGHT = 768
+SCALE_FACTOR = 1.0
+FONT_SIZE = BASE_FONT_SIZE
+TIMER_FONT_SIZE = BASE_TIMER_FONT_SIZE
+INSTRUCTION_FONT_SIZE = BASE_INSTRUCTION_FONT_SIZE
+SMALL_FONT_SIZE = BASE_SMALL_FONT_SIZE
+
+# Timer events for the event-driven redraw mode
+SECOND_EVENT = pygame.USEREVENT + 1
+EXPIRE_EVENT = pygame.USEREVENT + 2
+
+# State updates from a broadcast server, posted by the network thread
+REMOTE_EVENT = pygame.USEREVENT + 3
+
+# Edited bank contents, posted by the file watcher thread
+WATCH_EVENT = pygame.USEREVENT + 4
+
+def init_display():
+    """Start only the video and font subsystems and scale fonts to the screen"""
+    global SCREEN_WIDTH, SCREEN_HEIGHT, SCALE_FACTOR
+    global FONT_SIZE, TIMER_FONT_SIZE, INSTRUCTION_FONT_SIZE, SMALL_FONT_SIZE
+    
+    pygame.display.init()
+    pygame.font.init()
+    
+    # Get fullscreen resolution
+    info = pygame.display.Info()
+    SCREEN_WIDTH = info.current_w
+    SCREEN_HEIGHT = info.current_h
+    
+    # Scale fonts based on screen resolution
+    SCALE_FACTOR = min(SCREEN_WIDTH / 1024, SCREEN_HEIGHT / 768)
+    FONT_SIZE = int(BASE_FONT_SIZE * SCALE_FACTOR)
+    TIMER_FONT_SIZE = int(BASE_TIMER_FONT_SIZE * SCALE_FACTOR)
+    INSTRUCTION_FONT_SIZE = int(BASE_INSTRUCTION_FONT_SIZE * SCALE_FACTOR)
+    SMALL_FONT_SIZE = int(BASE_SMALL_FONT_SIZE * SCALE_FACTOR)
+
+class VirtualClock:
+    """Manually advanced stand-in for time.time() used by simulations"""
+    
+    def __init__(self, start=0.0):
+        self.now = start
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+class SessionTimeline:
+    """Absolute deadlines for every word of a session, fixed when it starts
+
+    Word n ends at start + (n + 1) * duration on a monotonic clock, however
+    late the frame loop notices it. A flip that lands late therefore
+    shortens the next word rather than pushing back the rest of the
+    session. Pausing shifts only the deadlines still ahead."""
+    
+    def __init__(self, start, word_count, duration):
+        self.deadlines = array('d', (start + (index + 1) * duration for index in range(word_count)))
+        self.paused_at = None
+    
+    @classmethod
+    def aligned(cls, index, deadline, word_count, duration):
+        """Timeline on which word index ends at deadline"""
+        return cls(deadline - (index + 1) * duration, word_count, duration)
+    
+    def remaining(self, index, now):
+        if self.paused_at is not None:
+            now = self.paused_at
+        return max(0.0, self.deadlines[index] - now)
+    
+    def pause(self, now):
+        if self.paused_at is None:
+            self.paused_at = now
+    
+    def resume(self, index, now):
+        """Push the current and later deadlines back by the time spent paused"""
+        if self.paused_at is None:
+            return
+        shift = now - self.paused_at
+        for later in range(index, len(self.deadlines)):
+            self.deadlines[later] += shift
+        self.paused_at = None
 
-# Scale fonts based on screen resolution
-SCALE_FACTOR = min(SCREEN_WIDTH / 1024, SCREEN_HEIGHT / 768)
-FONT_SIZE = int(BASE_FONT_SIZE * SCALE_FACTOR)
-TIMER_FONT_SIZE = int(TIMER_FONT_SIZE * SCALE_FACTOR)
-INSTRUCTION_FONT_SIZE = int(INSTRUCTION_FONT_SIZE * SCALE_FACTOR)
-SMALL_FONT_SIZE = int(SMALL_FONT_SIZE * SCALE_FACTOR)
+class TextCache:
+    """LRU cache of rendered text surfaces keyed on (text, font, color), capped by pixel memory"""
+    
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.surfaces = OrderedDict()
+    
+    def render(self, text, font, color):
+        """Return a cached surface, rasterising the glyphs only on a miss"""
+        key = (text, font, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        self.used_bytes += self._size(surface)
+        
+        # Evict least recently used surfaces, always keeping the newest one
+        while self.used_bytes > self.max_bytes and len(self.surfaces) > 1:
+            _, old_surface = self.surfaces.popitem(last=False)
+            self.used_bytes -= self._size(old_surface)
+        return surface
+    
+    def clear(self):
+        self.surfaces.clear()
+        self.used_bytes = 0
+    
+    @staticmethod
+    def _size(surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
 
 class WATApp:
-    def __init__(self):
-        # Set fullscreen mode
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
+    def __init__(self, report_stalls=False, event_driven=False, report_frames=False,
+                 headless=False, time_source=time.monotonic, bank_paths=None,
+                 schedule='sequential', seed=None, audio_buffer=None, countdown_cues=False,
+                 report_cue_latency=False, remote=None, controller=False,
+                 type_responses=False, responses_path='wat_responses.db', watch=False,
+                 metrics_path=None, profile=False):
+        self.startup_start = time.perf_counter()
+        self.startup_phases = []
+        
+        # Set fullscreen mode; headless runs draw to SDL's dummy driver in a plain window
+        init_display()
+        flags = 0 if headless else pygame.FULLSCREEN
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), flags)
         pygame.display.set_caption("SSB Word Association Test")
+        self.record_startup_phase('display', self.startup_start)
         
-        # Load bell sound
-        self.load_bell_sound()
+        # Put a blank frame up straight away; assets load behind it
+        phase_start = time.perf_counter()
+        self.screen.fill(BLACK)
+        pygame.display.flip()
+        self.record_startup_phase('first frame', phase_start)
+        
+        self.countdown_cues = countdown_cues
+        self.report_cue_latency = report_cue_latency
+        self.last_cue_time = None
+        self.cue_latencies = []
+        self.last_countdown = None
+        self.bell_sound = None
+        self.cue_sounds = {}
         
-        # Fonts
-        self.word_font = pygame.font.Font(None, FONT_SIZE)
-        self.timer_font = pygame.font.Font(None, TIMER_FONT_SIZE)
-        self.instruction_font = pygame.font.Font(None, INSTRUCTION_FONT_SIZE)
-        self.small_font = pygame.font.Font(None, SMALL_FONT_SIZE)
+        # Rendered text is reused across frames; the instruction screen is composited once
+        self.text_cache = TextCache()
+        self.instruction_surface = None
+        
+        # Session timing reads this monotonic clock, so changes to the wall clock cannot
+        # stretch a word; simulations swap in a VirtualClock and broadcast deadlines need the real one
+        self.time_source = time.monotonic if remote else time_source
         
         # Game state
         self.current_session_words = []  # Current 60 words for this session
@@ -58,108 +199,210 @@ class WATApp:
         self.max_words_per_session = 60
         self.is_running = False
         self.is_paused = False
-        self.start_time = 0
+        self.timeline = None  # Deadlines for the running session
         self.word_duration = 17  # 20 seconds per word
         self.waiting_for_start = True
         
-        # Load words from CSV
-        self.load_words()
+        # Word bank is read once and kept in memory; disk writes go to a worker thread
+        self.writer = BackgroundWriter()
+        self.word_bank = WordBank(bank_paths or ['wat.csv'], writer=self.writer)
+        
+        # Optional per-session timings, exported as JSON lines; None keeps the hot paths untouched
+        self.metrics = None
+        if metrics_path is not None:
+            self.metrics = Metrics(metrics_path, self.writer, profile)
+            self.writer.job_timer = self.metrics.record_writer_job
+        
+        # Typed-response mode: the candidate types each sentence, saved with its keystroke times
+        self.response_store = None
+        if type_responses and remote is None:
+            self.response_store = ResponseStore(responses_path, self.writer)
+        self.typed_response = ''
+        self.keystrokes = array('I')
+        self.fitted_response = None
+        
+        # Where a running session is, so a crash or kill can resume it at the same word
+        self.checkpoint = None
+        self.checkpoint_session = None
+        self.escape_pressed = False  # Only a quit by ESC drops the checkpoint; SIGTERM also arrives as QUIT
+        if remote is None:
+            self.checkpoint = SessionCheckpoint(self.word_bank.paths[0] + '.session', self.writer)
+        
+        # Decides which words make up each session
+        self.scheduler = create_scheduler(schedule, self.word_bank, seed,
+                                          self.word_bank.paths[0] + '.schedule')
+        
+        # Longest time a single frame spent on events, drawing and flipping
+        self.report_stalls = report_stalls
+        self.worst_stall = 0
+        
+        # Event-driven mode redraws only on events and only the regions that changed
+        self.event_driven = event_driven
+        self.report_frames = report_frames
+        self.frames_drawn = 0
+        self.drawn_rects = []
+        self.timer_rect = None
+        
+        # Word bank and audio load on worker threads while the fonts load here;
+        # a broadcast client gets its words from the server instead
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            jobs = [pool.submit(self.timed_startup_phase, 'audio', self.load_audio, audio_buffer)]
+            if remote is None:
+                jobs.append(pool.submit(self.timed_startup_phase, 'word bank', self.load_words))
+            self.timed_startup_phase('fonts', self.load_fonts)
+            for job in jobs:
+                job.result()
+        self.record_startup_phase('ready', self.startup_start)
+        if self.checkpoint is not None:
+            self.resume_checkpoint()
+        self.plan_layout()
+        
+        # Hot reload: edits to the bank files are spliced in without a full reload
+        self.watcher = None
+        if watch and remote is None:
+            self.writer.flush()  # Let any startup compaction finish before taking the baseline
+            self.word_bank.track_changes()
+            self.watcher = BankWatcher(self.word_bank, self.post_bank_change)
+            self.watcher.start()
+        
+        # Broadcast client: the server owns the schedule, only the controller can start or pause it
+        self.controller = controller
+        self.remote_link = None
+        self.remote_progress = None  # (shown, total) of the server's bank, from its state messages
+        if remote is not None:
+            host, port = remote
+            self.remote_link = DisplayLink(host, port, self.post_remote_message, controller)
+            self.remote_link.start()
         
         # Clock for controlling frame rate
         self.clock = pygame.time.Clock()
     
+    def record_startup_phase(self, name, phase_start):
+        """Note when a startup phase began and ended, relative to construction"""
+        self.startup_phases.append((name, phase_start - self.startup_start,
+                                    time.perf_counter() - self.startup_start))
+    
+    def timed_startup_phase(self, name, func, *args):
+        phase_start = time.perf_counter()
+        func(*args)
+        self.record_startup_phase(name, phase_start)
+    
+    def timed_io(self, name, func, *args):
+        """Call func, recording how long it blocked the main loop when metrics are on"""
+        if self.metrics is None:
+            return func(*args)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.metrics.record_io(name, time.perf_counter() - start)
+    
+    def print_startup_timing(self):
+        for name, start, end in self.startup_phases:
+            print(f"{name:<12} {start * 1000:7.1f} -> {end * 1000:7.1f} ms")
+    
+    def load_fonts(self):
+        """Load the base fonts and the layout that sizes words to fit the screen"""
+        self.font_pool = FontPool(max_fonts=12)
+        margin = int(40 * SCALE_FACTOR)
+        self.layout = TextLayout(SCREEN_WIDTH - 2 * margin, SMALL_FONT_SIZE, self.font_pool)
+        self.word_font = self.font_pool.get(FONT_SIZE)
+        self.timer_font = self.font_pool.get(TIMER_FONT_SIZE)
+        self.instruction_font = self.font_pool.get(INSTRUCTION_FONT_SIZE)
+        self.small_font = self.font_pool.get(SMALL_FONT_SIZE)
+    
+    def plan_layout(self):
+        """Fit the session's words before it starts, so a flip only looks up its font size"""
+        self.layout.plan([word_data.word for word_data in self.current_session_words], FONT_SIZE)
+    
+    def load_audio(self, audio_buffer=None):
+        """Open the mixer and load the bell and cue sounds"""
+        # Smaller mixer buffers get the cue out sooner after the word flip
+        self.setup_mixer(audio_buffer)
+        self.load_bell_sound()
+    
+    def setup_mixer(self, audio_buffer=None):
+        """Open the mixer, optionally with a smaller buffer for lower cue latency"""
+        try:
+            if audio_buffer:
+                pygame.mixer.quit()
+                pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=audio_buffer)
+            else:
+                pygame.mixer.init()
+        except pygame.error as e:
+            print(f"Could not open audio device: {e}")
+        # pygame 2 opens the mixer with a 512-sample buffer by default
+        self.audio_buffer = audio_buffer or 512
+        mixer_format = pygame.mixer.get_init()
+        self.output_latency = self.audio_buffer / mixer_format[0] if mixer_format else 0
+    
     def load_bell_sound(self):
         """Load bell sound file"""
+        if not pygame.mixer.get_init():
+            return
         try:
             self.bell_sound = pygame.mixer.Sound('bell.wav')
             print("Bell sound loaded successfully")
-        except pygame.error as e:
+        except (pygame.error, FileNotFoundError) as e:
             print(f"Could not load bell.wav: {e}")
-            print("Creating a simple beep sound as fallback")
-            # Create a simple beep sound programmatically as fallback
-            self.create_beep_sound()
-    
-    def create_beep_sound(self):
-        """Create a simple beep sound programmatically"""
-        try:
-            # Create a simple sine wave beep
-            sample_rate = 22050
-            duration = 0.3  # 300ms
-            frequency = 800  # 800 Hz
-            
-            frames = int(duration * sample_rate)
-            arr = []
-            for i in range(frames):
-                wave = 4096 * (i / frames) * (1 - i / frames)  # Triangle wave with fade
-                wave *= 0.3 * (1 + 0.5 * (i % 100) / 100)  # Add some variation
-                arr.append([int(wave), int(wave)])
-            
-            sound_array = pygame.sndarray.make_sound(pygame.array.array('i', arr))
-            self.bell_sound = sound_array
-            print("Fallback beep sound created")
-        except Exception as e:
-            print(f"Could not create fallback sound: {e}")
+            print("Synthesizing cue sounds as fallback")
             self.bell_sound = None
+        self.create_cue_sounds()
+    
+    def create_cue_sounds(self):
+        """Synthesize cues in the mixer's format; bell.wav, if loaded, still covers the main cues"""
+        self.cue_sounds = {}
+        if not pygame.mixer.get_init():
+            return
+        for name in CUES:
+            if self.bell_sound and name != 'last_three':
+                continue
+            try:
+                self.cue_sounds[name] = load_cue(name, os.path.join(CACHE_DIR, 'cues'))
+            except Exception as e:
+                print(f"Could not create {name} cue: {e}")
+                return
     
-    def play_bell(self):
-        """Play bell sound"""
-        if self.bell_sound:
+    def play_cue(self, name):
+        """Play a cue, falling back to the bell sound"""
+        sound = self.cue_sounds.get(name, self.bell_sound)
+        if sound:
             try:
-                self.bell_sound.play()
+                sound.play()
+                if name != 'last_three':
+                    self.last_cue_time = time.perf_counter()
             except Exception as e:
-                print(f"Error playing bell sound: {e}")
+                print(f"Error playing {name} cue: {e}")
+    
+    def record_flip(self):
+        """Count a drawn frame and measure the last cue against it"""
+        self.frames_drawn += 1
+        if self.last_cue_time is not None:
+            # Positive means the cue is heard after the new frame is on screen
+            audible_time = self.last_cue_time + self.output_latency
+            self.cue_latencies.append(audible_time - time.perf_counter())
+            self.last_cue_time = None
     
     def load_words(self):
         """Load words and find next 60 unshown words"""
         self.current_session_words = []
         
-        try:
-            with open('wat.csv', 'r+', encoding='utf-8') as file:
-                lines = file.readlines()
-                
-                if not lines:
-                    return
-                
-                # Parse CSV manually for simple r+ handling
-                for i, line in enumerate(lines[1:], 1):  # Skip header
-                    parts = line.strip().split(',')
-                    if len(parts) >= 3:
-                        word = parts[0].strip().upper()
-                        response = parts[1].strip()
-                        shown = parts[2].strip().lower() == 'true'
-                        
-                        # If not shown and we need more words for session
-                        if not shown and len(self.current_session_words) < self.max_words_per_session:
-                            self.current_session_words.append({
-                                'word': word,
-                                'response': response,
-                                'line_index': i
-                            })
-                
-                # If no unshown words found, reset all and start over
-                if len(self.current_session_words) == 0:
-                    self.reset_all_words()
-                    # Try again after reset
-                    file.seek(0)
-                    lines = file.readlines()
-                    for i, line in enumerate(lines[1:], 1):
-                        parts = line.strip().split(',')
-                        if len(parts) >= 3:
-                            word = parts[0].strip().upper()
-                            response = parts[1].strip()
-                            
-                            if len(self.current_session_words) < self.max_words_per_session:
-                                self.current_session_words.append({
-                                    'word': word,
-                                    'response': response,
-                                    'line_index': i
-                                })
-                                
-        except FileNotFoundError:
-            self.create_default_csv()
-            self.load_words()  # Try again after creating default
-    
-    def create_default_csv(self):
+        if not self.word_bank.loaded:
+            try:
+                self.word_bank.load()
+            except FileNotFoundError as e:
+                self.create_default_csv(e.filename)
+                self.load_words()  # Try again after creating default
+                return
+        
+        # If no unshown words left, reset all and start over
+        if self.word_bank.unshown_count == 0 and self.word_bank.total_count > 0:
+            self.reset_all_words()
+        
+        rows = self.scheduler.select(self.max_words_per_session)
+        self.current_session_words = [self.word_bank.word_data(row) for row in rows]
+    
+    def create_default_csv(self, path='wat.csv'):
         """Create default CSV file with more comprehensive SSB-style words"""
         default_words = [
             ("LEADERSHIP", "I lead by example and inspire others to achieve their best"),
@@ -224,147 +467,126 @@ class WATApp:
             ("MISSION", "I am committed to accomplishing every mission successfully")
         ]
         
-        with open('wat.csv', 'w', newline='', encoding='utf-8') as file:
+        with open(path, 'w', newline='', encoding='utf-8') as file:
             file.write('word,best_response,shown\n')
             for word, response in default_words:
                 file.write(f'{word},{response},false\n')
     
-    def mark_word_shown(self, line_index):
+    def mark_word_shown(self, row):
         """Mark a specific word as shown in the CSV file"""
         try:
-            with open('wat.csv', 'r+', encoding='utf-8') as file:
-                lines = file.readlines()
-                
-                if line_index < len(lines):
-                    parts = lines[line_index].strip().split(',')
-                    if len(parts) >= 3:
-                        # Change false to true
-                        parts[2] = 'true'
-                        lines[line_index] = ','.join(parts) + '\n'
-                        
-                        # Write back
-                        file.seek(0)
-                        file.writelines(lines)
-                        file.truncate()
-                        
+            # Constant-size journal append; the CSV is rewritten only on compaction
+            self.timed_io('mark_shown', self.word_bank.mark_shown, row)
         except Exception as e:
             print(f"Error marking word as shown: {e}")
     
     def reset_all_words(self):
         """Reset all words to false"""
         try:
-            with open('wat.csv', 'r+', encoding='utf-8') as file:
-                lines = file.readlines()
-                
-                for i in range(1, len(lines)):  # Skip header
-                    parts = lines[i].strip().split(',')
-                    if len(parts) >= 3:
-                        parts[2] = 'false'
-                        lines[i] = ','.join(parts) + '\n'
-                
-                file.seek(0)
-                file.writelines(lines)
-                file.truncate()
-                
+            self.timed_io('reset', self.word_bank.reset)
         except Exception as e:
             print(f"Error resetting words: {e}")
     
+    def compact_progress(self):
+        """Fold the progress journal back into the CSV file"""
+        try:
+            self.timed_io('compact', self.word_bank.compact)
+        except Exception as e:
+            print(f"Error saving progress: {e}")
+    
+    def save_schedule(self):
+        """Write the scheduler's per-word state on the writer thread"""
+        snapshot = self.timed_io('schedule_snapshot', self.scheduler.snapshot)
+        if snapshot is not None:
+            self.writer.submit(self.scheduler.write_state, snapshot)
+    
     def prepare_session(self):
         """Load next session words"""
         self.load_words()
     
     def draw_text_centered(self, text, font, color, y_offset=0):
         """Draw text centered on screen"""
-        text_surface = font.render(text, True, color)
+        text_surface = self.text_cache.render(text, font, color)
         text_rect = text_surface.get_rect()
         text_rect.center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + y_offset)
         self.screen.blit(text_surface, text_rect)
+        self.drawn_rects.append(text_rect)
         return text_rect
     
+    def compose_instructions(self):
+        """Render the static part of the instruction screen into one surface"""
+        surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        surface.fill(BLACK)
+        
+        # Title near the top, the rest centred between it and the progress line
+        title = "SSB Word Association Test"
+        title_font = self.layout.font(title, TIMER_FONT_SIZE)
+        title_surface = title_font.render(title, True, GREEN)
+        title_rect = title_surface.get_rect(centerx=SCREEN_WIDTH // 2, top=SCREEN_HEIGHT // 12)
+        surface.blit(title_surface, title_rect)
+        
+        heading = INSTRUCTION_FONT_SIZE
+        lines = [
+            ("INSTRUCTIONS:", heading, BLUE),
+            ("", heading, None),
+            (f"• You will see {self.max_words_per_session} words, "
+             f"each displayed for {self.word_duration:g} seconds.", heading, WHITE),
+            ("Type one Sentence on each Word" if self.response_store else "Write one Sentence on each Word",
+             heading, WHITE),
+            ("", heading, None),
+            ("CONTROLS:", heading, BLUE),
+            ("", heading, None),
+            (f"• {self.pause_key_name()}: Pause/Resume during test", heading, WHITE),
+            ("• ESC: Exit application", heading, WHITE),
+            ("", heading, None),
+            ("Press ENTER to start the session", TIMER_FONT_SIZE, GREEN)
+        ]
+        colors = {text: color for text, _, color in lines}
+        
+        progress_top = SCREEN_HEIGHT // 2 + int(350 * SCALE_FACTOR) - self.small_font.get_linesize()
+        gap = title_font.get_linesize()
+        placed = self.layout.stack([(text, size) for text, size, _ in lines], title_rect.bottom + gap,
+                                   progress_top - gap)
+        for text, font, y in placed:
+            text_surface = font.render(text, True, colors[text])
+            surface.blit(text_surface, text_surface.get_rect(centerx=SCREEN_WIDTH // 2, top=y))
+        
+        return surface
+    
     def draw_instructions(self):
         """Draw instruction screen - waiting for Enter to start"""
-        # Title - larger and more prominent
-        title_offset = int(-300 * SCALE_FACTOR)
-        title_surface = self.timer_font.render("SSB Word Association Test", True, GREEN)
-        title_rect = title_surface.get_rect()
-        title_rect.center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + title_offset)
-        self.screen.blit(title_surface, title_rect)
-        
-        # Main instructions with better spacing
-        instructions = [
-            "","","",            
-            "INSTRUCTIONS:",
-            "",
-            "",
-            "",
-            "• You will see 60 words, each displayed for 15 seconds.",
-            "Write one Sentence on each Word",
-            "CONTROLS:",
-            "",
-            "• SPACEBAR: Pause/Resume during test",
-            "",
-            "• ESC: Exit application",
-            "",
-            "Press ENTER to start the session"
-        ]
+        if self.instruction_surface is None:
+            self.instruction_surface = self.compose_instructions()
+        self.screen.blit(self.instruction_surface, (0, 0))
         
-        y_start = int(-150 * SCALE_FACTOR)
-        line_spacing = int(35 * SCALE_FACTOR)
-        
-        for i, instruction in enumerate(instructions):
-            if instruction == "INSTRUCTIONS:" or instruction == "CONTROLS:":
-                color = BLUE
-                font = self.instruction_font
-            elif instruction == "Press ENTER to start the session":
-                color = GREEN
-                font = self.timer_font
-            elif instruction.startswith("•"):
-                color = WHITE
-                font = self.instruction_font
-            else:
-                color = WHITE
-                font = self.instruction_font
-            
-            if instruction.strip():
-                text_surface = font.render(instruction, True, color)
-                text_rect = text_surface.get_rect()
-                text_rect.centerx = SCREEN_WIDTH // 2
-                text_rect.y = y_start + (i * line_spacing)
-                self.screen.blit(text_surface, text_rect)
-        
-        # Show progress at bottom with more space
-        try:
-            with open('wat.csv', 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-                total_words = len(lines) - 1  # Exclude header
-                shown_count = sum(1 for line in lines[1:] if line.strip().split(',')[2].strip().lower() == 'true')
-                progress_text = f"Progress: {shown_count}/{total_words} words completed"
-                progress_offset = int(350 * SCALE_FACTOR)
-                self.draw_text_centered(progress_text, self.small_font, DARK_GRAY, progress_offset)
-        except:
-            pass
+        # Show progress at bottom with more space; a remote display has no bank
+        # of its own, so the controller shows the server's
+        if self.remote_link is None:
+            progress = (self.word_bank.shown_count, self.word_bank.total_count)
+        else:
+            progress = self.remote_progress if self.controller else None
+        if progress is None:
+            progress_text = "Waiting for the session to start"
+        else:
+            progress_text = f"Progress: {progress[0]}/{progress[1]} words completed"
+        progress_offset = int(350 * SCALE_FACTOR)
+        self.draw_text_centered(progress_text, self.small_font, DARK_GRAY, progress_offset)
     
     def draw_word_screen(self):
         """Draw the current word and timer"""
         if self.current_word_index < len(self.current_session_words):
             current_word_data = self.current_session_words[self.current_word_index]
-            current_word = current_word_data['word']
+            current_word = current_word_data.word
             
             # Calculate remaining time
-            if not self.is_paused:
-                elapsed_time = time.time() - self.start_time
-                remaining_time = max(0, self.word_duration - elapsed_time)
-            else:
-                remaining_time = getattr(self, 'paused_remaining_time', self.word_duration)
+            remaining_time = self.get_remaining_time()
             
-            # Draw word (large and prominent)
-            self.draw_text_centered(current_word, self.word_font, WHITE, 0)
+            # Draw word (large and prominent), shrunk if it would not fit the screen
+            word_font = self.layout.font(current_word, FONT_SIZE)
+            self.draw_text_centered(current_word, word_font, WHITE, 0)
             
             # Draw timer
-            timer_text = f"{int(remaining_time)}"
-            timer_color = RED if remaining_time <= 3 else GREEN
-            timer_offset = int(-120 * SCALE_FACTOR)
-            self.draw_text_centered(timer_text, self.timer_font, timer_color, timer_offset)
+            self.draw_timer(remaining_time)
             
             # Draw session progress
             progress_text = f"{self.current_word_index + 1} / {len(self.current_session_words)}"
@@ -376,12 +598,85 @@ class WATApp:
                 pause_offset = int(150 * SCALE_FACTOR)
                 resume_offset = int(180 * SCALE_FACTOR)
                 self.draw_text_centered("PAUSED", self.instruction_font, GREEN, pause_offset)
-                self.draw_text_centered("Press SPACEBAR to resume", self.small_font, WHITE, resume_offset)
+                self.draw_text_centered(f"Press {self.pause_key_name()} to resume", self.small_font, WHITE, resume_offset)
+            
+            # Draw the sentence typed so far
+            if self.response_store is not None:
+                response_offset = int(250 * SCALE_FACTOR)
+                self.draw_text_centered(self.fit_response_text(), self.instruction_font, WHITE, response_offset)
             
-            # Check if time is up
-            if not self.is_paused and remaining_time <= 0:
+            # Check if time is up; event-driven mode flips on EXPIRE_EVENT instead
+            if not self.event_driven and not self.is_paused and remaining_time <= 0:
                 self.next_word()
     
+    def pause_key_name(self):
+        # Space is part of a typed sentence, so typing mode pauses on TAB
+        return "TAB" if self.response_store is not None else "SPACEBAR"
+    
+    def fit_response_text(self):
+        """Typed text with a cursor, trimmed from the left to fit the screen width"""
+        text = self.typed_response + '_'
+        if self.fitted_response is not None and self.fitted_response[0] == text:
+            return self.fitted_response[1]
+        
+        max_width = SCREEN_WIDTH - int(80 * SCALE_FACTOR)
+        visible = text
+        if self.instruction_font.size(text)[0] > max_width:
+            # Binary search for the longest tail that fits
+            low, high = 0, len(text)
+            while low < high:
+                middle = (low + high) // 2
+                if self.instruction_font.size('...' + text[middle:])[0] <= max_width:
+                    high = middle
+                else:
+                    low = middle + 1
+            visible = '...' + text[low:]
+        self.fitted_response = (text, visible)
+        return visible
+    
+    def type_text(self, text):
+        """Add typed characters and note when, in word time, they arrived"""
+        self.typed_response += text
+        self.record_keystroke()
+    
+    def erase_text(self):
+        if self.typed_response:
+            self.typed_response = self.typed_response[:-1]
+            self.record_keystroke()
+    
+    def record_keystroke(self):
+        elapsed = self.word_duration - self.get_remaining_time()
+        self.keystrokes.append(int(elapsed * 1000))
+    
+    def record_response(self):
+        """Queue the sentence typed for the current word and clear the input"""
+        word_data = self.current_session_words[self.current_word_index]
+        self.timed_io('response_add', self.response_store.add, self.current_word_index, word_data.word,
+                      self.typed_response, self.keystrokes)
+        self.typed_response = ''
+        self.keystrokes = array('I')
+    
+    def get_remaining_time(self):
+        """Seconds left on the current word, read off the session timeline"""
+        if self.timeline is None or self.current_word_index >= len(self.timeline.deadlines):
+            return self.word_duration
+        return self.timeline.remaining(self.current_word_index, self.time_source())
+    
+    def draw_timer(self, remaining_time):
+        """Draw the countdown digit and remember where it went"""
+        timer_text = f"{int(remaining_time)}"
+        timer_color = RED if remaining_time <= 3 else GREEN
+        timer_offset = int(-120 * SCALE_FACTOR)
+        self.timer_rect = self.draw_text_centered(timer_text, self.timer_font, timer_color, timer_offset)
+        
+        # Tick on each of the last three digits
+        countdown = int(remaining_time)
+        if self.countdown_cues and not self.is_paused and countdown != self.last_countdown:
+            if 0 < countdown <= 3:
+                self.play_cue('last_three')
+        self.last_countdown = countdown
+        return self.timer_rect
+    
     def draw_session_complete_screen(self):
         """Draw session completion screen"""
         complete_offset = int(-100 * SCALE_FACTOR)
@@ -393,23 +688,18 @@ class WATApp:
         self.draw_text_centered(completed_text, self.instruction_font, WHITE, completed_offset)
         
         # Check if more words are available
-        try:
-            with open('wat.csv', 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-                unshown_count = sum(1 for line in lines[1:] if line.strip().split(',')[2].strip().lower() == 'false')
-                
-                if unshown_count > 0:
-                    next_text = f"{unshown_count} words remaining"
-                    self.draw_text_centered(next_text, self.instruction_font, BLUE, 0)
-                    next_session_offset = int(50 * SCALE_FACTOR)
-                    self.draw_text_centered("Press ENTER for next session", self.instruction_font, WHITE, next_session_offset)
-                else:
-                    self.draw_text_centered("All words completed!", self.instruction_font, GREEN, 0)
-                    restart_offset = int(50 * SCALE_FACTOR)
-                    self.draw_text_centered("Press ENTER to restart from beginning", self.instruction_font, WHITE, restart_offset)
-        except:
+        unshown_count = self.word_bank.unshown_count
+        if self.remote_link is not None:
+            self.draw_text_centered("Waiting for the next session", self.instruction_font, BLUE, 0)
+        elif unshown_count > 0:
+            next_text = f"{unshown_count} words remaining"
+            self.draw_text_centered(next_text, self.instruction_font, BLUE, 0)
             next_session_offset = int(50 * SCALE_FACTOR)
             self.draw_text_centered("Press ENTER for next session", self.instruction_font, WHITE, next_session_offset)
+        else:
+            self.draw_text_centered("All words completed!", self.instruction_font, GREEN, 0)
+            restart_offset = int(50 * SCALE_FACTOR)
+            self.draw_text_centered("Press ENTER to restart from beginning", self.instruction_font, WHITE, restart_offset)
         
         quit_offset = int(100 * SCALE_FACTOR)
         self.draw_text_centered("Press ESC to quit", self.small_font, DARK_GRAY, quit_offset)
@@ -421,9 +711,19 @@ class WATApp:
             self.is_paused = False
             self.waiting_for_start = False
             self.current_word_index = 0
-            self.start_time = time.time()
+            start = self.time_source()
+            self.timeline = SessionTimeline(start, len(self.current_session_words), self.word_duration)
+            self.frames_drawn = 0
+            if self.metrics is not None:
+                self.metrics.begin_session(start)
+            if self.response_store is not None:
+                self.typed_response = ''
+                self.keystrokes = array('I')
+                self.response_store.begin_session(self.word_bank.paths, len(self.current_session_words))
+            self.update_checkpoint_session()
+            self.save_checkpoint()
             # Play bell sound when starting session
-            self.play_bell()
+            self.play_cue('session_start')
     
     def pause_resume(self):
         """Toggle pause/resume"""
@@ -433,85 +733,520 @@ class WATApp:
         if self.is_paused:
             # Resume
             self.is_paused = False
-            self.start_time = time.time() - (self.word_duration - self.paused_remaining_time)
-            self.play_bell()  # Play bell when resuming
+            now = self.time_source()
+            self.timeline.resume(self.current_word_index, now)
+            if self.metrics is not None:
+                self.metrics.resume(now)
+            self.play_cue('pause')  # Play bell when resuming
         else:
             # Pause
             self.is_paused = True
-            elapsed_time = time.time() - self.start_time
-            self.paused_remaining_time = max(0, self.word_duration - elapsed_time)
-            self.play_bell()  # Play bell when pausing
+            now = self.time_source()
+            self.timeline.pause(now)
+            if self.metrics is not None:
+                self.metrics.pause(now)
+            # Words the candidate pauses on come back sooner; one removed by a hot reload has no row
+            row = self.current_session_words[self.current_word_index].row
+            if row is not None:
+                self.scheduler.boost(row)
+            self.save_checkpoint()
+            self.play_cue('pause')  # Play bell when pausing
     
     def next_word(self):
         """Move to next word"""
+        if self.remote_link is not None:
+            self.advance_remote_word()
+            return
+        
         # Mark current word as shown
         if self.current_word_index < len(self.current_session_words):
+            if self.metrics is not None:
+                self.metrics.record_flip(self.time_source(), self.timeline.deadlines[self.current_word_index],
+                                         self.word_duration)
+            if self.response_store is not None:
+                self.record_response()
             word_data = self.current_session_words[self.current_word_index]
-            self.mark_word_shown(word_data['line_index'])
+            if word_data.row is not None:
+                self.mark_word_shown(word_data.row)
+                self.scheduler.record_shown(word_data.row)
         
         self.current_word_index += 1
         
         if self.current_word_index < len(self.current_session_words):
-            self.start_time = time.time()
+            self.save_checkpoint()
             # Play bell sound when changing to next word
-            self.play_bell()
+            self.play_cue('word_change')
         else:
             # Session complete
             self.is_running = False
             self.waiting_for_start = True
-            self.load_words()  # Prepare next session
+            self.checkpoint.clear()
+            if self.report_frames:
+                print(f"Frames drawn this session: {self.frames_drawn}")
+            if self.response_store is not None:
+                self.response_store.flush()
+            self.compact_progress()
+            self.save_schedule()
+            self.timed_io('load_words', self.load_words)  # Prepare next session
+            self.plan_layout()
+            if self.metrics is not None:
+                self.export_metrics(self.current_word_index, completed=True)
             # Play bell sound when session completes
-            self.play_bell()
+            self.play_cue('session_start')
+    
+    def update_checkpoint_session(self):
+        """Cache the parts of the checkpoint that stay fixed while words flip"""
+        self.checkpoint_session = {
+            'banks': list(self.word_bank.paths),
+            'rows': [word_data.row for word_data in self.current_session_words],
+            'words': [word_data.word for word_data in self.current_session_words],
+            'duration': self.word_duration,
+            'response_session': self.response_store.session_id if self.response_store is not None else None
+        }
+    
+    def save_checkpoint(self):
+        """Queue the current word and its time left; the write happens on the writer thread"""
+        if self.checkpoint is not None:
+            self.checkpoint.save(dict(self.checkpoint_session, index=self.current_word_index,
+                                      remaining=self.get_remaining_time()))
+    
+    def resume_checkpoint(self):
+        """Pick up a session cut short by a crash, paused on the word it reached"""
+        state = self.checkpoint.load()
+        if state is None or state['banks'] != list(self.word_bank.paths):
+            return
+        
+        # Rows follow the word if the bank was edited since
+        words = self.word_bank.words
+        session_words = []
+        index = state['index']
+        for position, (row, word) in enumerate(zip(state['rows'], state['words'])):
+            if row is None or row >= len(words) or words[row] != word:
+                try:
+                    row = words.index(word)
+                except ValueError:
+                    row = None
+            if row is not None:
+                session_words.append(self.word_bank.word_data(row))
+            elif position < state['index']:
+                index -= 1
+        if index >= len(session_words):
+            self.checkpoint.clear()
+            return
+        
+        self.current_session_words = session_words
+        self.current_word_index = index
+        self.word_duration = state['duration']
+        self.is_running = True
+        self.is_paused = True
+        self.waiting_for_start = False
+        now = self.time_source()
+        self.timeline = SessionTimeline.aligned(index, now + state['remaining'], len(session_words),
+                                                self.word_duration)
+        self.timeline.pause(now)
+        if self.metrics is not None:
+            self.metrics.begin_session(self.timeline.deadlines[0] - self.word_duration, flips=index)
+            self.metrics.pause(now)
+        if self.response_store is not None and state['response_session'] is not None:
+            self.response_store.resume_session(state['response_session'], self.word_bank.paths,
+                                               len(session_words))
+        self.update_checkpoint_session()
+        print(f"Resumed the last session at word {index + 1} of {len(session_words)}, "
+              f"{state['remaining']:.0f}s left; press {self.pause_key_name()} to continue")
+    
+    def export_metrics(self, word_count, completed):
+        """Queue the session's metrics record on the writer thread"""
+        self.metrics.end_session(self.time_source(), word_count, completed,
+                                 words_shown=self.current_word_index, word_duration=self.word_duration,
+                                 event_driven=self.event_driven, frames_drawn=self.frames_drawn)
+    
+    def post_remote_message(self, message):
+        """Hand a server message to the main thread; called on the network thread"""
+        pygame.event.post(pygame.event.Event(REMOTE_EVENT, message=message))
+    
+    def advance_remote_word(self):
+        """Flip at the shared deadline without waiting for the server's message"""
+        # The last word is held until the server ends the session
+        if self.current_word_index + 1 < len(self.current_session_words):
+            self.current_word_index += 1
+            self.play_cue('word_change')
+    
+    def apply_remote_state(self, message):
+        """Follow the broadcast server's schedule"""
+        if message['type'] != 'state':
+            return  # Disconnected: keep the last state until the link resyncs
+        if 'words' in message:
+            self.current_session_words = [WordRecord(None, word) for word in message['words']]
+            self.plan_layout()
+        if message['duration'] != self.word_duration:
+            self.instruction_surface = None  # The instructions state the duration
+        self.word_duration = message['duration']
+        if 'progress' in message:
+            self.remote_progress = tuple(message['progress'])
+        
+        if not message['running']:
+            if self.is_running:
+                # Session complete
+                self.is_running = False
+                self.waiting_for_start = True
+                self.current_word_index = len(self.current_session_words)
+                self.play_cue('session_start')
+            return
+        
+        if not self.is_running:
+            self.play_cue('session_start' if message['index'] == 0 else 'word_change')
+        elif message['index'] != self.current_word_index:
+            self.play_cue('word_change')
+        elif message['paused'] != self.is_paused:
+            self.play_cue('pause')
+        self.is_running = True
+        self.waiting_for_start = False
+        self.current_word_index = message['index']
+        self.is_paused = message['paused']
+        # Rebuild the timeline around the server's deadline for this word
+        count = len(self.current_session_words)
+        if self.is_paused:
+            now = self.time_source()
+            self.timeline = SessionTimeline.aligned(self.current_word_index, now + message['remaining'],
+                                                    count, self.word_duration)
+            self.timeline.pause(now)
+        else:
+            self.timeline = SessionTimeline.aligned(self.current_word_index, message['local_deadline'],
+                                                    count, self.word_duration)
+    
+    def post_bank_change(self, source_index, data, stat):
+        """Hand an edited bank to the main thread; called on the watcher thread"""
+        pygame.event.post(pygame.event.Event(WATCH_EVENT, source_index=source_index, data=data, stat=stat))
+    
+    def apply_bank_change(self, source_index, data, stat):
+        """Splice an edited bank into the bank, scheduler and session without touching the current word"""
+        try:
+            splice = self.timed_io('apply_change', self.word_bank.apply_change, source_index, data, stat)
+        except Exception as e:
+            print(f"Error reloading {self.word_bank.paths[source_index]}: {e}")
+            return
+        if splice is None:
+            return
+        self.scheduler.apply_splice(splice)
+        
+        # Words already shown, and the one on screen, only follow their row;
+        # upcoming words pick up edits, and are dropped if they were removed
+        current = self.current_word_index if self.is_running else -1
+        session_words = []
+        for index, word_data in enumerate(self.current_session_words):
+            edited = word_data.row is not None and splice.start <= word_data.row < splice.end
+            row = splice.remap(word_data.row, word_data.word)
+            if index <= current or not edited:
+                word_data.row = row
+                session_words.append(word_data)
+            elif row is not None:
+                session_words.append(self.word_bank.word_data(row))
+        self.current_session_words = session_words
+        self.plan_layout()
+        if self.is_running:
+            self.update_checkpoint_session()
+            self.save_checkpoint()
+        print(f"Reloaded {self.word_bank.paths[source_index]}: {self.word_bank.total_count} words")
     
     def handle_events(self):
         """Handle pygame events"""
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+            if not self.handle_event(event):
+                return False
+        
+        return True
+    
+    def handle_event(self, event):
+        """Handle a single pygame event; returns False to quit"""
+        if event.type == pygame.QUIT:
+            return False
+        
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.escape_pressed = True
                 return False
             
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    return False
-                
-                elif event.key == pygame.K_RETURN:
-                    if self.waiting_for_start:
-                        self.start_session()
-                
-                elif event.key == pygame.K_SPACE:
-                    if self.is_running and not self.waiting_for_start:
-                        self.pause_resume()
+            elif event.key == pygame.K_F9 and self.metrics is not None:
+                profiling = self.metrics.toggle_profile()
+                print("Profiling started" if profiling else "Profiling stopped")
+            
+            elif self.remote_link is not None:
+                # Keys only send requests; the server's reply changes the screen
+                if self.controller and event.key == pygame.K_RETURN and self.waiting_for_start:
+                    self.remote_link.send({'type': 'start'})
+                elif self.controller and event.key == pygame.K_SPACE and self.is_running:
+                    self.remote_link.send({'type': 'toggle_pause'})
+            
+            elif event.key == pygame.K_RETURN:
+                if self.waiting_for_start:
+                    self.start_session()
+            
+            elif event.key == (pygame.K_TAB if self.response_store is not None else pygame.K_SPACE):
+                if self.is_running and not self.waiting_for_start:
+                    self.pause_resume()
+            
+            elif event.key == pygame.K_BACKSPACE:
+                if self.response_store is not None and self.is_running and not self.is_paused:
+                    self.erase_text()
+        
+        elif event.type == pygame.TEXTINPUT:
+            if self.response_store is not None and self.is_running and not self.is_paused:
+                self.type_text(event.text)
+        
+        elif event.type == EXPIRE_EVENT:
+            if self.is_running and not self.is_paused and self.get_remaining_time() <= 0:
+                self.next_word()
+        
+        elif event.type == REMOTE_EVENT:
+            self.apply_remote_state(event.message)
+        
+        elif event.type == WATCH_EVENT:
+            self.apply_bank_change(event.source_index, event.data, event.stat)
         
         return True
     
+    def draw_screen(self):
+        """Draw whichever screen matches the current state"""
+        self.drawn_rects = []
+        if self.waiting_for_start:
+            if not self.is_running:
+                # Either initial start or session complete
+                if self.current_word_index == 0:
+                    self.draw_instructions()
+                else:
+                    self.draw_session_complete_screen()
+        elif self.is_running:
+            self.draw_word_screen()
+    
+    def screen_state(self):
+        """Key that changes whenever more than the timer digit needs redrawing"""
+        screen = 'word' if self.is_running else ('instructions' if self.current_word_index == 0 else 'complete')
+        return (screen, self.current_word_index, self.is_paused, self.word_bank.shown_count,
+                self.word_bank.total_count, self.remote_progress, self.typed_response)
+    
+    def schedule_timers(self):
+        """Arm one-shot timers for the next second boundary and for word expiry"""
+        pygame.time.set_timer(SECOND_EVENT, 0)
+        pygame.time.set_timer(EXPIRE_EVENT, 0)
+        if not self.is_running or self.is_paused:
+            return
+        
+        remaining_time = self.get_remaining_time()
+        expire_ms = max(1, math.ceil(remaining_time * 1000))
+        second_ms = max(1, math.ceil((remaining_time - math.floor(remaining_time)) * 1000))
+        if second_ms < expire_ms:
+            pygame.time.set_timer(SECOND_EVENT, second_ms, loops=1)
+        pygame.time.set_timer(EXPIRE_EVENT, expire_ms, loops=1)
+    
     def run(self):
         """Main game loop"""
+        if self.event_driven:
+            self.run_event_driven()
+        else:
+            self.run_fixed_rate()
+        
+        if self.watcher is not None:
+            self.watcher.stop()
+        
+        # A word quit on mid-session counts as skipped; a broadcast session is the server's to track
+        if self.remote_link is not None:
+            self.remote_link.close()
+        elif self.is_running and self.current_word_index < len(self.current_session_words):
+            row = self.current_session_words[self.current_word_index].row
+            if row is not None:
+                self.scheduler.boost(row)
+            if self.response_store is not None:
+                self.record_response()
+            if self.metrics is not None:
+                self.export_metrics(len(self.current_session_words), completed=False)
+        
+        if self.response_store is not None:
+            self.response_store.close()
+        if self.checkpoint is not None and self.escape_pressed:
+            self.checkpoint.clear()  # Quitting on purpose does not resume
+        
+        # Save progress before quitting
+        self.save_schedule()
+        self.word_bank.close()
+        self.writer.close()
+        if self.report_stalls:
+            print(f"Worst main-loop stall: {self.worst_stall * 1000:.1f} ms")
+        if self.report_cue_latency and self.cue_latencies:
+            average = sum(self.cue_latencies) / len(self.cue_latencies)
+            worst = max(self.cue_latencies, key=abs)
+            print(f"Cue latency vs frame flip: average {average * 1000:+.1f} ms, worst {worst * 1000:+.1f} ms "
+                  f"({self.audio_buffer}-sample buffer)")
+        pygame.quit()
+        sys.exit()
+    
+    def run_fixed_rate(self):
+        """Redraw the full screen at 60 FPS"""
         running = True
         
         while running:
+            frame_start = time.perf_counter()
             running = self.handle_events()
             
             # Clear screen with dark background
             self.screen.fill(BLACK)
             
             # Draw appropriate screen
-            if self.waiting_for_start:
-                if not self.is_running:
-                    # Either initial start or session complete
-                    if self.current_word_index == 0:
-                        self.draw_instructions()
-                    else:
-                        self.draw_session_complete_screen()
-            elif self.is_running:
-                self.draw_word_screen()
+            self.draw_screen()
             
             # Update display
             pygame.display.flip()
+            self.record_flip()
+            frame_time = time.perf_counter() - frame_start
+            self.worst_stall = max(self.worst_stall, frame_time)
+            if self.metrics is not None:
+                self.metrics.record_frame(frame_time)
             self.clock.tick(60)  # 60 FPS
+    
+    def simulate_sessions(self, sessions=1, frame_step=None):
+        """Run whole sessions against a VirtualClock, drawing one frame per step"""
+        if not isinstance(self.time_source, VirtualClock):
+            raise ValueError("simulate_sessions needs a VirtualClock time source")
+        if frame_step is None:
+            frame_step = self.word_duration
         
-        # Save progress before quitting
+        for _ in range(sessions):
+            self.start_session()
+            while self.is_running:
+                self.time_source.advance(frame_step)
+                self.screen.fill(BLACK)
+                self.draw_screen()
+                pygame.display.flip()
+                self.record_flip()
+        self.writer.flush()
+    
+    def run_event_driven(self):
+        """Sleep until an event arrives and redraw only what it changed"""
+        # Only events that can change the screen wake the loop
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN, pygame.TEXTINPUT,
+                                  SECOND_EVENT, EXPIRE_EVENT, REMOTE_EVENT, WATCH_EVENT])
+        
+        state = None
+        running = True
+        
+        while running:
+            events = [pygame.event.wait()] + pygame.event.get()
+            frame_start = time.perf_counter()
+            
+            for event in events:
+                running = self.handle_event(event)
+                if not running:
+                    break
+            if not running:
+                break
+            
+            new_state = self.screen_state()
+            if state is None or new_state[0] != state[0]:
+                # Different screen: clear and flip everything
+                self.screen.fill(BLACK)
+                self.draw_screen()
+                pygame.display.flip()
+            elif new_state != state:
+                # Same screen, new word or pause banner: repaint the old and new text areas
+                dirty_rects = self.drawn_rects
+                for rect in dirty_rects:
+                    self.screen.fill(BLACK, rect)
+                self.draw_screen()
+                pygame.display.update(dirty_rects + self.drawn_rects)
+            elif self.is_running and self.timer_rect is not None:
+                # Second boundary: only the countdown digit changed
+                old_rect = self.timer_rect
+                self.screen.fill(BLACK, old_rect)
+                self.draw_timer(self.get_remaining_time())
+                pygame.display.update([old_rect, self.timer_rect])
+            else:
+                continue
+            
+            # Drawing can itself advance the word, so read the state again
+            self.record_flip()
+            state = self.screen_state()
+            self.schedule_timers()
+            frame_time = time.perf_counter() - frame_start
+            self.worst_stall = max(self.worst_stall, frame_time)
+            if self.metrics is not None:
+                self.metrics.record_frame(frame_time)
+    
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSB Word Association Test")
+    parser.add_argument('--report-stalls', action='store_true',
+                        help="print the worst-case main-loop stall on exit")
+    parser.add_argument('--event-driven', action='store_true',
+                        help="redraw only on input and timer events instead of at 60 FPS")
+    parser.add_argument('--report-frames', action='store_true',
+                        help="print the number of frames drawn at the end of each session")
+    parser.add_argument('--bank', nargs='+', default=['wat.csv'], metavar='CSV',
+                        help="word bank file(s) to use; words repeated across banks are shown once")
+    parser.add_argument('--schedule', choices=POLICIES, default='sequential',
+                        help="word selection: bank order, spaced repetition by due session, "
+                             "by priority, or seeded random order")
+    parser.add_argument('--seed', type=int, help="random seed for --schedule random")
+    parser.add_argument('--audio-buffer', type=int, metavar='SAMPLES',
+                        help="mixer buffer size; smaller values lower cue latency (e.g. 256)")
+    parser.add_argument('--countdown-cues', action='store_true',
+                        help="tick during the last three seconds of each word")
+    parser.add_argument('--report-cue-latency', action='store_true',
+                        help="print how far cues land from the matching frame flip on exit")
+    parser.add_argument('--headless', action='store_true',
+                        help="use SDL's dummy video and audio drivers")
+    parser.add_argument('--simulate', type=int, metavar='SESSIONS',
+                        help="run this many sessions on a virtual clock and exit")
+    parser.add_argument('--startup-timing', action='store_true',
+                        help="print how long each startup phase took")
+    parser.add_argument('--type-responses', action='store_true',
+                        help="type each sentence; responses and keystroke times are saved to SQLite")
+    parser.add_argument('--responses-db', default='wat_responses.db', metavar='PATH',
+                        help="database for --type-responses (default wat_responses.db)")
+    parser.add_argument('--watch', action='store_true',
+                        help="reload edits to the bank files while the app is running")
+    parser.add_argument('--metrics', nargs='?', const='wat_metrics.jsonl', metavar='PATH',
+                        help="append per-session frame, flip and I/O timings to a JSON-lines file "
+                             "(default wat_metrics.jsonl)")
+    parser.add_argument('--profile', action='store_true',
+                        help="run cProfile from startup and save a .prof file per session; "
+                             "F9 toggles it (implies --metrics)")
+    parser.add_argument('--connect', metavar='HOST:PORT',
+                        help="show a session run by 'python broadcast.py serve'")
+    parser.add_argument('--controller', action='store_true',
+                        help="with --connect, let this display start and pause the session")
+    args = parser.parse_args()
+    if args.profile and args.metrics is None:
+        args.metrics = 'wat_metrics.jsonl'
+    
+    # Headless runs need SDL's dummy drivers selected before the display opens
+    if args.headless:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    
+    if args.simulate:
+        app = WATApp(report_frames=args.report_frames, headless=args.headless,
+                     time_source=VirtualClock(), bank_paths=args.bank,
+                     schedule=args.schedule, seed=args.seed,
+                     metrics_path=args.metrics, profile=args.profile)
+        if args.startup_timing:
+            app.print_startup_timing()
+        start = time.perf_counter()
+        app.simulate_sessions(args.simulate)
+        print(f"Simulated {args.simulate} session(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        app.save_schedule()
+        app.word_bank.close()
+        app.writer.close()
         pygame.quit()
         sys.exit()
-
-if __name__ == "__main__":
-    app = WATApp()
+    
+    app = WATApp(report_stalls=args.report_stalls, event_driven=args.event_driven,
+                 report_frames=args.report_frames, headless=args.headless,
+                 bank_paths=args.bank, schedule=args.schedule, seed=args.seed,
+                 audio_buffer=args.audio_buffer, countdown_cues=args.countdown_cues,
+                 report_cue_latency=args.report_cue_latency,
+                 remote=parse_address(args.connect) if args.connect else None,
+                 controller=args.controller, type_responses=args.type_responses,
+                 responses_path=args.responses_db, watch=args.watch,
+                 metrics_path=args.metrics, profile=args.profile)
+    if args.startup_timing:
+        app.print_startup_timing()
     app.run()
@@ -0,0 +1,45 @@
+import threading
+
+
+class BankWatcher:
+    """Polls the bank files on a background thread and reports edits
+
+    Only a stat() per file per poll until something changes. A changed
+    file is read once its size and mtime are stable across the read, so a
+    half-saved file is picked up on a later poll instead. The new bytes go
+    to on_change(source_index, data, stat), which must hand them to the
+    thread that owns the bank."""
+
+    def __init__(self, bank, on_change, interval=1.0):
+        self.bank = bank
+        self.on_change = on_change
+        self.interval = interval
+        self.reported = {}
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='wat-watcher', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            for source_index, source in enumerate(self.bank.sources):
+                try:
+                    self.poll(source_index, source)
+                except OSError:
+                    pass  # Mid-save or briefly missing; try again next poll
+
+    def poll(self, source_index, source):
+        stat = source.stat_key()
+        if stat == source.known_stat or stat == self.reported.get(source_index):
+            return
+        with open(source.path, 'rb') as file:
+            data = file.read()
+        if source.stat_key() != stat:
+            return
+        self.reported[source_index] = stat
+        self.on_change(source_index, data, stat)
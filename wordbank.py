@@ -0,0 +1,920 @@
+import csv
+import hashlib
+import io
+import os
+import pickle
+import queue
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from functools import partial
+from itertools import chain, repeat
+from operator import add
+from sys import intern
+
+
+class ProgressJournal:
+    """Append-only log of shown/reset records, folded into the CSV by compaction"""
+
+    def __init__(self, path, sync_every=8):
+        self.path = path
+        self.sync_every = sync_every
+        self.file = None
+        self.unsynced = 0
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def append_shown(self, line_index, word):
+        self._append(f"S {line_index} {word}\n")
+
+    def append_reset(self):
+        self._append("R\n")
+
+    def _append(self, record):
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(record)
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """Force buffered records to disk"""
+        if self.file is not None and self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def records(self):
+        """Yield parsed records; a torn last line from a crash is skipped"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.endswith('\n'):
+                        break
+                    parts = line.rstrip('\n').split(' ', 2)
+                    if parts[0] == 'R':
+                        yield ('R', None, None)
+                    elif parts[0] == 'S' and len(parts) == 3 and parts[1].isdigit():
+                        yield ('S', int(parts[1]), parts[2])
+        except FileNotFoundError:
+            return
+
+    def clear(self):
+        """Drop all records once they are folded into the CSV"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+class BackgroundWriter:
+    """Single worker thread that runs persistence jobs in submission order"""
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = None
+        # Optional job_timer(name, seconds), called on the worker thread after each job
+        self.job_timer = None
+
+    def submit(self, func, *args):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._work, name='wat-writer', daemon=True)
+            self.thread.start()
+        self.jobs.put((func, args))
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                func, args = job
+                if self.job_timer is None:
+                    func(*args)
+                else:
+                    start = time.perf_counter()
+                    func(*args)
+                    self.job_timer(getattr(func, '__name__', type(func).__name__), time.perf_counter() - start)
+            except Exception as e:
+                print(f"Error in background writer: {e}")
+            finally:
+                self.jobs.task_done()
+
+    def flush(self):
+        """Block until every submitted job has run"""
+        if self.thread is not None:
+            self.jobs.join()
+
+    def close(self):
+        """Flush pending jobs and stop the worker thread"""
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+CACHE_VERSION = 3
+CACHE_DIR = '.wat_cache'
+
+# Bits set in each byte value, and any byte with at least one clear bit
+POPCOUNT = bytes(bin(value).count('1') for value in range(256))
+NOT_FULL = re.compile(b'[^\xff]')
+
+DIFF_BLOCKS = (1 << 16, 1 << 12, 1 << 8, 1 << 4, 1)
+
+
+def read_records(file):
+    """Stream (record_index, fields) pairs; quoted fields may span lines"""
+    for record_index, fields in enumerate(csv.reader(file)):
+        yield record_index, fields
+
+
+def read_raw_records(file):
+    """Stream (record_index, fields, raw_text) so unchanged records can be copied verbatim"""
+    raw = []
+
+    def lines():
+        for line in file:
+            raw.append(line)
+            yield line
+
+    for record_index, fields in enumerate(csv.reader(lines())):
+        text = ''.join(raw)
+        raw.clear()
+        yield record_index, fields, text
+
+
+def detect_schema(header):
+    """Map column roles to indices from a header row
+
+    Trailing empty columns are ignored. A file without a recognisable header
+    is read positionally as word, best_response, shown."""
+    names = [name.strip().lower() for name in header]
+    if 'word' not in names:
+        return {'word': 0, 'response': 1, 'shown': 2, 'meaning': None, 'header': False}
+
+    def find(*candidates):
+        for candidate in candidates:
+            if candidate in names:
+                return names.index(candidate)
+        return None
+
+    return {
+        'word': names.index('word'),
+        'response': find('best_response', 'response'),
+        'shown': find('shown'),
+        'meaning': find('meaning'),
+        'header': True
+    }
+
+
+def field(fields, index):
+    if index is None or index >= len(fields):
+        return ''
+    return fields[index].strip()
+
+
+class ShownBitmap:
+    """One bit per row, set once the word has been shown
+
+    An eighth of the memory of a byte per row. Finding the next unshown row
+    is a C-level regex scan for a byte with a clear bit, and counting uses
+    a popcount translation table."""
+
+    __slots__ = ('bits', 'size')
+
+    def __init__(self, size=0, data=None):
+        self.size = size
+        self.bits = bytearray(data) if data is not None else bytearray((size + 7) // 8)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        return self.bits[row >> 3] >> (row & 7) & 1
+
+    def set(self, row, value):
+        if value:
+            self.bits[row >> 3] |= 1 << (row & 7)
+        else:
+            self.bits[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+    def append(self, value):
+        if self.size & 7 == 0:
+            self.bits.append(0)
+        self.size += 1
+        self.set(self.size - 1, value)
+
+    def count(self, start=0, end=None):
+        """Number of set bits in [start, end)"""
+        end = self.size if end is None else end
+        total = 0
+        while start < end and start & 7:
+            total += self[start]
+            start += 1
+        while end > start and end & 7:
+            end -= 1
+            total += self[end]
+        return total + sum(self.bits[start >> 3:end >> 3].translate(POPCOUNT))
+
+    def clear_range(self, start, end):
+        while start < end and start & 7:
+            self.set(start, False)
+            start += 1
+        while end > start and end & 7:
+            end -= 1
+            self.set(end, False)
+        self.bits[start >> 3:end >> 3] = bytes((end - start) >> 3)
+
+    def find_clear(self, start=0):
+        """First row at or after start whose bit is clear, or -1"""
+        if start >= self.size:
+            return -1
+        index = start >> 3
+        # Treat the bits below start as set
+        value = self.bits[index] | ((1 << (start & 7)) - 1)
+        if value == 0xFF:
+            match = NOT_FULL.search(self.bits, index + 1)
+            if match is None:
+                return -1
+            index = match.start()
+            value = self.bits[index]
+        row = (index << 3) + (~value & (value + 1)).bit_length() - 1
+        return row if row < self.size else -1
+
+    def splice(self, start, end, values):
+        """Replace rows [start, end) with values, shifting later rows"""
+        bits = int.from_bytes(self.bits, 'little')
+        middle = 0
+        for offset, value in enumerate(values):
+            middle |= bool(value) << offset
+        tail = bits >> end
+        bits = (bits & ((1 << start) - 1)) | (middle << start) | (tail << (start + len(values)))
+        self.size += len(values) - (end - start)
+        self.bits = bytearray(bits.to_bytes((self.size + 7) // 8, 'little'))
+
+    def copy(self):
+        return ShownBitmap(self.size, self.bits)
+
+    def tobytes(self):
+        return bytes(self.bits)
+
+
+class WordRecord:
+    """Session entry for one row, copied out of the bank's columns"""
+
+    __slots__ = ('row', 'word', 'response', 'meaning', 'line_index')
+
+    def __init__(self, row, word, response='', meaning='', line_index=None):
+        self.row = row
+        self.word = word
+        self.response = response
+        self.meaning = meaning
+        self.line_index = line_index
+
+
+class RowSplice:
+    """Rows [start, end) replaced by new rows; later rows move by the difference"""
+
+    __slots__ = ('start', 'end', 'old_words', 'rows_by_word', 'line_shift')
+
+    def __init__(self, start, end, old_words, rows_by_word):
+        self.start = start
+        self.end = end
+        self.old_words = old_words
+        self.rows_by_word = rows_by_word
+        self.line_shift = 0
+
+    @property
+    def shift(self):
+        return len(self.rows_by_word) - (self.end - self.start)
+
+    def remap(self, row, word):
+        """Where a row went, or None if its word was removed or renamed"""
+        if row is None or row < self.start:
+            return row
+        if row >= self.end:
+            return row + self.shift
+        return self.rows_by_word.get(word)
+
+
+def common_prefix(a, b, limit):
+    """Length of the shared prefix, compared in shrinking blocks"""
+    i = 0
+    for size in DIFF_BLOCKS:
+        while i + size <= limit and a[i:i + size] == b[i:i + size]:
+            i += size
+    return i
+
+
+def common_suffix(a, b, limit):
+    """Length of the shared suffix, at most limit bytes"""
+    i = 0
+    for size in DIFF_BLOCKS:
+        while i + size <= limit and a[len(a) - i - size:len(a) - i] == b[len(b) - i - size:len(b) - i]:
+            i += size
+    return i
+
+
+def changed_region(old, new):
+    """Smallest run of whole lines that differs: (start, old_end, new_end), or None"""
+    if old == new:
+        return None
+    start = old.rfind(b'\n', 0, common_prefix(old, new, min(len(old), len(new)))) + 1
+    suffix = common_suffix(old, new, min(len(old), len(new)) - start)
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+    # Both sides must end on a line boundary; the shared suffix extends them equally
+    if old_end < len(old) and (old[old_end - 1:old_end] != b'\n' or new[new_end - 1:new_end] != b'\n'):
+        line_end = old.find(b'\n', old_end)
+        old_end = len(old) if line_end < 0 else line_end + 1
+    return start, old_end, len(new) - (len(old) - old_end)
+
+
+def record_words(records, schema, whole_file=False):
+    """Upper-cased word of each record, skipping blank words and a whole file's header"""
+    records = iter(records)
+    if whole_file and schema['header']:
+        next(records, None)
+    for fields in records:
+        word = field(fields, schema['word']).upper()
+        if word:
+            yield word
+
+
+def count_lines(data, start, end):
+    if start >= end:
+        return 0
+    return data.count(b'\n', start, end) + (data[end - 1:end] != b'\n')
+
+
+def has_multiline_records(data):
+    """True if a quoted field spans lines, so records and lines do not line up"""
+    return b'"' in data and any(line.count(b'"') & 1 for line in data.split(b'\n'))
+
+
+class BankSource:
+    """One CSV file contributing rows to a WordBank"""
+
+    def __init__(self, path):
+        self.path = path
+        self.journal = ProgressJournal(path + '.journal')
+        self.dirty = False
+        self.schema = None
+        self.parsed_stat = None  # Stat of the file the bank's columns were built from
+        # Last known bytes of the file, kept only while watching it for edits
+        self.content = None
+        self.known_stat = None
+        self.multiline = False
+
+    def stat_key(self):
+        stat = os.stat(self.path)
+        return (os.path.abspath(self.path), stat.st_mtime_ns, stat.st_size)
+
+    def track(self):
+        """Remember the file's current bytes so later edits can be diffed against them"""
+        stat = self.stat_key()
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        self.content = data
+        self.multiline = has_multiline_records(data)
+        self.known_stat = stat
+        if self.schema is None:
+            first_line = data.split(b'\n', 1)[0].decode('utf-8')
+            self.schema = detect_schema(next(csv.reader([first_line]), []))
+
+    def rewrite(self, row_for_line, words, shown):
+        """Atomically rewrite the file with the given shown flags, then clear the journal
+
+        Runs on the writer thread. Only records whose flag changed are
+        re-serialised; every other record is copied through untouched, so
+        edits made since the bank was parsed survive. Returns False if there
+        were such edits: the columns no longer match the file."""
+        unchanged = self.stat_key() == self.parsed_stat
+        self.journal.sync()
+        temp_path = self.path + '.tmp'
+        with open(self.path, 'r', encoding='utf-8', newline='') as source, \
+                open(temp_path, 'w', encoding='utf-8', newline='') as target:
+            writer = csv.writer(target, lineterminator='\n')
+            schema = None
+            for record_index, fields, text in read_raw_records(source):
+                if schema is None:
+                    schema = detect_schema(fields)
+                    if schema['header']:
+                        if schema['shown'] is None:
+                            # Banks without a shown column gain one the first time progress is saved
+                            schema['shown'] = len(fields)
+                            writer.writerow(fields + ['shown'])
+                        else:
+                            target.write(text)
+                        continue
+
+                row = row_for_line(record_index)
+                if row is None or field(fields, schema['word']).upper() != words[row]:
+                    target.write(text)
+                    continue
+
+                current = field(fields, schema['shown'])
+                if (current.lower() == 'true') == shown[row]:
+                    target.write(text)
+                    continue
+
+                value = 'true' if shown[row] else 'false'
+                fields = fields + [''] * (schema['shown'] + 1 - len(fields))
+                # Keep the record's own flag style, e.g. FALSE/TRUE in the set2/set3 banks
+                fields[schema['shown']] = value.upper() if current.isupper() else value
+                writer.writerow(fields)
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(temp_path, self.path)
+        self.journal.clear()
+        if unchanged:
+            self.parsed_stat = self.stat_key()
+            if self.content is not None:
+                # Our own rewrite is not an edit to reload; an outside edit is left for the watcher
+                self.track()
+        return unchanged
+
+
+class WordBank:
+    """In-memory view of one or more word bank CSVs with live shown/unshown counters
+
+    Words are de-duplicated across banks, first bank wins. Parsed rows are
+    cached in a binary file keyed on each bank's mtime and size.
+
+    Rows are integer ids into parallel columns: interned word strings,
+    responses, meanings, an array of CSV line numbers and a ShownBitmap.
+    Each bank's rows are a contiguous range ordered by line. A hot-reload
+    splice that moves later lines records the move in a small per-bank
+    offset table instead of rewriting their line numbers. Finding unshown
+    words scans the bitmap from a cursor, so picking a session costs O(k)
+    Python steps however large the bank is."""
+
+    def __init__(self, paths='wat.csv', writer=None, use_cache=True):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = list(paths)
+        self.writer = writer  # Optional BackgroundWriter; disk work runs inline without one
+        self.use_cache = use_cache
+        self.sources = [BankSource(path) for path in self.paths]
+        self.words = []
+        self.responses = []
+        self.meanings = []
+        self.shown = ShownBitmap()
+        self.row_line = array('I')
+        # Per bank: rows (relative to its first) from which stored lines are off by an offset
+        self.line_offsets = []
+        self.source_starts = []
+        self.shown_count = 0
+        self.first_unshown = 0  # No row before this one is unshown
+        self.loaded = False
+        self.loaded_from_cache = False
+        self.word_rows = None  # Word to row, built by track_changes to de-duplicate edited rows
+        self.word_counts = None
+        self.splices = 0  # Edits applied; a cache write started before one is dropped
+
+    @property
+    def total_count(self):
+        return len(self.words)
+
+    @property
+    def unshown_count(self):
+        return len(self.words) - self.shown_count
+
+    @property
+    def cache_path(self):
+        key = '\0'.join(os.path.abspath(path) for path in self.paths)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + '.bin'
+        return os.path.join(os.path.dirname(os.path.abspath(self.paths[0])), CACHE_DIR, name)
+
+    def load(self, replay=True):
+        """Build the bank from the binary cache, or parse the CSVs and refresh the cache
+
+        With replay=False, progress journals are left for the app to fold in,
+        so readers such as batch scoring never rewrite a bank."""
+        stat_keys = [source.stat_key() for source in self.sources]
+        for source, stat_key in zip(self.sources, stat_keys):
+            source.parsed_stat = stat_key
+
+        self.loaded_from_cache = self.use_cache and self._load_cache(stat_keys)
+        if not self.loaded_from_cache:
+            self._parse_sources()
+            if self.use_cache:
+                self._persist(self._write_cache, stat_keys, self.shown.copy(), self.splices)
+
+        self.shown_count = self.shown.count()
+        self.first_unshown = 0
+        self.loaded = True
+
+        # Fold in progress left over from a previous run
+        if replay and any(source.journal.exists() for source in self.sources):
+            self.replay_journal()
+            self.compact()
+
+    def _parse_sources(self, contents=None):
+        """Parse every bank from disk, or from in-memory bytes when contents is given"""
+        self.words = []
+        self.responses = []
+        self.meanings = []
+        self.shown = ShownBitmap()
+        self.row_line = array('I')
+        self.line_offsets = [([], []) for _ in self.sources]
+        self.source_starts = []
+        seen = set()
+
+        for source_index, source in enumerate(self.sources):
+            self.source_starts.append(len(self.words))
+            if contents is None:
+                file = open(source.path, 'r', encoding='utf-8', newline='')
+            else:
+                file = io.StringIO(contents[source_index].decode('utf-8'), newline='')
+            with file:
+                schema = None
+                for record_index, fields in read_records(file):
+                    if schema is None:
+                        schema = source.schema = detect_schema(fields)
+                        if schema['header']:
+                            continue
+
+                    word = field(fields, schema['word']).upper()
+                    if not word or word in seen:
+                        continue
+                    seen.add(word)
+
+                    self.words.append(intern(word))
+                    self.responses.append(field(fields, schema['response']))
+                    self.meanings.append(field(fields, schema['meaning']))
+                    self.shown.append(field(fields, schema['shown']).lower() == 'true')
+                    self.row_line.append(record_index)
+
+    def _load_cache(self, stat_keys):
+        try:
+            with open(self.cache_path, 'rb') as file:
+                data = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+        if data.get('version') != CACHE_VERSION or data.get('sources') != stat_keys:
+            return False
+
+        self.words = [intern(word) for word in data['words']]
+        self.responses = data['responses']
+        self.meanings = data['meanings']
+        self.shown = ShownBitmap(len(self.words), data['shown'])
+        self.row_line = array('I', data['row_line'])
+        self.line_offsets = [([], []) for _ in self.sources]
+        self.source_starts = data['source_starts']
+        return True
+
+    def _write_cache(self, stat_keys, shown, splices):
+        """Cache the columns as of the given splice count
+
+        Runs on the writer thread against the live columns, so the file is
+        only kept if no edit was spliced in before or while it was written."""
+        if self.splices != splices:
+            return
+        cache_path = self.cache_path
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        data = {
+            'version': CACHE_VERSION,
+            'sources': stat_keys,
+            'words': self.words,
+            'responses': self.responses,
+            'meanings': self.meanings,
+            'shown': shown.tobytes(),
+            'row_line': self.line_column().tobytes(),
+            'source_starts': self.source_starts
+        }
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.splices != splices:
+            os.remove(temp_path)
+            return
+        os.replace(temp_path, cache_path)
+
+    def source_rows(self, source_index):
+        """Range of rows contributed by one bank"""
+        start = self.source_starts[source_index]
+        end = self.source_starts[source_index + 1] if source_index + 1 < len(self.sources) else len(self.words)
+        return start, end
+
+    def source_of_row(self, row):
+        return bisect_right(self.source_starts, row) - 1
+
+    def line_segments(self, source_index):
+        """(start, end, offset) runs of a bank's rows whose stored lines are off by offset"""
+        start, end = self.source_rows(source_index)
+        bounds, offsets = self.line_offsets[source_index]
+        low, offset = start, 0
+        for bound, next_offset in zip(chain(bounds, (end - start,)), chain(offsets, (0,))):
+            yield low, start + bound, offset
+            low, offset = start + bound, next_offset
+
+    def line_of(self, row):
+        """CSV record index of a row"""
+        source_index = self.source_of_row(row)
+        bounds, offsets = self.line_offsets[source_index]
+        index = bisect_right(bounds, row - self.source_starts[source_index]) - 1
+        return self.row_line[row] + (offsets[index] if index >= 0 else 0)
+
+    def line_column(self):
+        """Every row's CSV record index, with the splice offsets applied"""
+        if not any(bounds for bounds, _ in self.line_offsets):
+            return self.row_line
+        lines = array('I')
+        for source_index in range(len(self.sources)):
+            for start, end, offset in self.line_segments(source_index):
+                stored = self.row_line[start:end]
+                lines.extend(map(add, stored, repeat(offset, len(stored))) if offset else stored)
+        return lines
+
+    def row_for_line(self, source_index, line_index):
+        """Row holding a bank's record, or None if it was skipped or de-duplicated"""
+        if not self.line_offsets[source_index][0]:
+            start, end = self.source_rows(source_index)
+            row = bisect_left(self.row_line, line_index, start, end)
+            if row < end and self.row_line[row] == line_index:
+                return row
+            return None
+        row, offset = self.bisect_line(source_index, line_index)
+        if row < self.source_rows(source_index)[1] and self.row_line[row] + offset == line_index:
+            return row
+        return None
+
+    def bisect_line(self, source_index, line_index):
+        """First row of a bank at or after a record and its offset, or the bank's end"""
+        # Lines rise across segments, so the first segment reaching line_index holds it
+        for start, end, offset in self.line_segments(source_index):
+            row = bisect_left(self.row_line, line_index - offset, start, end)
+            if row < end:
+                return row, offset
+        return self.source_rows(source_index)[1], 0
+
+    def replay_journal(self):
+        """Apply journal records on top of the CSV state"""
+        for source_index, source in enumerate(self.sources):
+            if not source.journal.exists():
+                continue
+            source.dirty = True
+            for kind, line_index, word in source.journal.records():
+                if kind == 'R':
+                    self._reset_source(source_index)
+                else:
+                    row = self.row_for_line(source_index, line_index)
+                    # Skip records that no longer match the row, e.g. after a manual edit
+                    if row is not None and self.words[row] == word:
+                        self._set_shown(row, True)
+
+    def compact(self, refresh_cache=True):
+        """Atomically rewrite changed banks with the current state and clear their journals"""
+        dirty = [index for index, source in enumerate(self.sources) if source.dirty]
+        if not dirty:
+            return
+        for source_index in dirty:
+            self.sources[source_index].dirty = False
+        # Snapshot now so later in-memory changes go to the next journal, not this file
+        self._persist(self._write_compacted, dirty, self.shown.copy(), refresh_cache and self.splices)
+
+    def _write_compacted(self, source_indices, shown, splices):
+        for source_index in source_indices:
+            self.sources[source_index].rewrite(partial(self.row_for_line, source_index), self.words, shown)
+        # A bank edited since it was parsed would be cached with columns that miss the edit
+        if (self.use_cache and splices is not False
+                and all(source.stat_key() == source.parsed_stat for source in self.sources)):
+            self._write_cache([source.parsed_stat for source in self.sources], shown, splices)
+
+    def track_changes(self):
+        """Keep each bank's bytes so apply_change can splice in just the edited rows"""
+        for source in self.sources:
+            source.track()
+        self.word_rows = {word: row for row, word in enumerate(self.words)}
+        # Every record's word, duplicates included, so an edit can tell when another copy takes over
+        self.word_counts = Counter()
+        for source in self.sources:
+            records = csv.reader(io.StringIO(source.content.decode('utf-8'), newline=''))
+            self.word_counts.update(record_words(records, source.schema, whole_file=True))
+
+    def apply_change(self, source_index, data, stat):
+        """Splice an edited bank file into the columns; returns a RowSplice or None
+
+        Only the lines between the first and last changed byte are parsed, and
+        words that survive an edit keep their shown-state. Some edits re-parse
+        every bank from the bytes already in memory: a changed header, a quoted
+        field spanning lines, or a duplicated word whose first copy changes."""
+        source = self.sources[source_index]
+        region = changed_region(source.content, data)
+        if region is None:
+            source.content = data
+            source.known_stat = source.parsed_stat = stat
+            return None
+
+        splice = self._splice_lines(source_index, data, region)
+        line_shift = splice is None or splice.line_shift
+        if splice is None:
+            splice = self._reparse_all(source_index, data)
+
+        source.content = data
+        source.known_stat = source.parsed_stat = stat
+        self.splices += 1
+        # Journal records name lines, so fold them in before lines move under them.
+        # The cache is left stale: startup or the next session's compaction refreshes it
+        if line_shift and source.dirty:
+            self.compact(refresh_cache=False)
+        return splice
+
+    def _splice_lines(self, source_index, data, region):
+        """Replace the rows of the changed lines, or return None if that cannot be done locally"""
+        source = self.sources[source_index]
+        schema = source.schema
+        start, old_end, new_end = region
+        first_line = source.content.count(b'\n', 0, start)
+        if source.multiline or (first_line == 0 and schema['header']):
+            return None
+        old_records = list(csv.reader(io.StringIO(source.content[start:old_end].decode('utf-8'), newline='')))
+        records = list(csv.reader(io.StringIO(data[start:new_end].decode('utf-8'), newline='')))
+        if len(records) != count_lines(data, start, new_end):
+            return None
+
+        # Rows of this bank whose records lie in the changed lines
+        source_start, source_end = self.source_rows(source_index)
+        start_row = self.bisect_line(source_index, first_line)[0]
+        end_row = self.bisect_line(source_index, first_line + len(old_records))[0]
+        old_words = self.words[start_row:end_row]
+
+        removed_counts = Counter(record_words(old_records, schema))
+        added_counts = Counter(record_words(records, schema))
+        for word in set(old_words).difference(added_counts):
+            if self.word_counts[word] - removed_counts[word]:
+                return None  # A copy elsewhere becomes the one shown
+        old_word_set = set(old_words)
+        for word in added_counts:
+            if word in self.word_rows and word not in old_word_set and self.row_of_word(word) >= end_row:
+                return None  # The edit adds an earlier copy of a word from a later row
+
+        old_shown = {word: self.shown[row] for row, word in enumerate(old_words, start_row)}
+        for word in old_words:
+            del self.word_rows[word]
+        self.word_counts.subtract(removed_counts)
+        self.word_counts.update(added_counts)
+
+        words, responses, meanings, lines, shown = [], [], [], array('I'), []
+        for record_index, fields in enumerate(records, first_line):
+            word = field(fields, schema['word']).upper()
+            if not word or word in self.word_rows:
+                continue
+            self.word_rows[word] = start_row + len(words)
+            words.append(intern(word))
+            responses.append(field(fields, schema['response']))
+            meanings.append(field(fields, schema['meaning']))
+            lines.append(record_index)
+            shown.append(old_shown.get(word, field(fields, schema['shown']).lower() == 'true'))
+
+        line_shift = len(records) - len(old_records)
+        self.words[start_row:end_row] = words
+        self.responses[start_row:end_row] = responses
+        self.meanings[start_row:end_row] = meanings
+        self.row_line[start_row:end_row] = lines
+        self._offset_lines(source_index, start_row - source_start, end_row - source_start,
+                           len(words), line_shift, source_end - source_start)
+        self.shown.splice(start_row, end_row, shown)
+        self.shown_count += sum(shown) - sum(old_shown.values())
+        self.first_unshown = min(self.first_unshown, start_row)
+
+        splice = RowSplice(start_row, end_row, old_words, {word: row for row, word in enumerate(words, start_row)})
+        splice.line_shift = line_shift
+        for later in range(source_index + 1, len(self.sources)):
+            self.source_starts[later] += splice.shift
+        return splice
+
+    def _offset_lines(self, source_index, start, end, count, line_shift, size):
+        """Update a bank's offset table after its relative rows [start, end) became count rows
+
+        The new rows store their real lines. Later records move by line_shift,
+        which is added to their offsets rather than to each stored line."""
+        bounds, offsets = self.line_offsets[source_index]
+        index = bisect_right(bounds, end) - 1
+        tail_offset = offsets[index] if index >= 0 else 0
+        new_bounds, new_offsets = [], []
+
+        def append(bound, offset):
+            if offset != (new_offsets[-1] if new_offsets else 0):
+                new_bounds.append(bound)
+                new_offsets.append(offset)
+
+        for bound, offset in zip(bounds, offsets):
+            if bound >= start:
+                break
+            append(bound, offset)
+        if count:
+            append(start, 0)
+        if end < size:
+            append(start + count, tail_offset + line_shift)
+        for bound, offset in zip(bounds, offsets):
+            if bound > end:
+                append(bound + count - (end - start), offset + line_shift)
+        # Swapped in whole, as the writer thread may be reading the old table
+        self.line_offsets[source_index] = (new_bounds, new_offsets)
+
+    def row_of_word(self, word):
+        """Row of a word in the bank, while tracking changes
+
+        Rows after a splice that moved them are not updated in word_rows, so
+        a stale entry is found again by scanning and refreshed."""
+        row = self.word_rows[word]
+        if row >= len(self.words) or self.words[row] != word:
+            row = self.word_rows[word] = self.words.index(word)
+        return row
+
+    def _reparse_all(self, source_index, data):
+        """Rebuild every bank from memory, carrying shown-state over by word"""
+        old_words = self.words
+        old_shown = {word: self.shown[row] for row, word in enumerate(old_words)}
+        contents = [data if index == source_index else source.content for index, source in enumerate(self.sources)]
+        self.sources[source_index].schema = None
+        self.sources[source_index].multiline = has_multiline_records(data)
+        self._parse_sources(contents)
+
+        for row, word in enumerate(self.words):
+            if word in old_shown:
+                self.shown.set(row, old_shown[word])
+        self.shown_count = self.shown.count()
+        self.first_unshown = 0
+        self.word_rows = {word: row for row, word in enumerate(self.words)}
+        self.word_counts = Counter()
+        for source, content in zip(self.sources, contents):
+            records = csv.reader(io.StringIO(content.decode('utf-8'), newline=''))
+            self.word_counts.update(record_words(records, source.schema, whole_file=True))
+        return RowSplice(0, len(old_words), old_words, {word: row for row, word in enumerate(self.words)})
+
+    def close(self):
+        for source in self.sources:
+            self._persist(source.journal.close)
+
+    def _persist(self, func, *args):
+        if self.writer is not None:
+            self.writer.submit(func, *args)
+        else:
+            func(*args)
+
+    def unshown_rows(self, limit):
+        """Return up to limit unshown rows in bank order"""
+        rows = []
+        row = self.shown.find_clear(self.first_unshown)
+        if row >= 0:
+            self.first_unshown = row
+        while row >= 0 and len(rows) < limit:
+            rows.append(row)
+            row = self.shown.find_clear(row + 1)
+        return rows
+
+    def session_words(self, limit):
+        """Return up to limit unshown words in bank order"""
+        return [self.word_data(row) for row in self.unshown_rows(limit)]
+
+    def word_data(self, row):
+        """Session entry for one row"""
+        return WordRecord(row, self.words[row], self.responses[row], self.meanings[row], self.line_of(row))
+
+    def mark_shown(self, row):
+        """Mark a word as shown and journal it; returns True if the flag changed"""
+        if not self._set_shown(row, True):
+            return False
+        source = self.sources[self.source_of_row(row)]
+        source.dirty = True
+        self._persist(source.journal.append_shown, self.line_of(row), self.words[row])
+        return True
+
+    def reset(self):
+        """Mark every word as unshown with one journal record per bank"""
+        for source_index, source in enumerate(self.sources):
+            self._reset_source(source_index)
+            source.dirty = True
+            self._persist(source.journal.append_reset)
+
+    def _set_shown(self, row, shown):
+        if row is None or row >= len(self.shown) or self.shown[row] == shown:
+            return False
+
+        self.shown.set(row, shown)
+        self.shown_count += 1 if shown else -1
+        if not shown:
+            self.first_unshown = min(self.first_unshown, row)
+        return True
+
+    def _reset_source(self, source_index):
+        start, end = self.source_rows(source_index)
+        self.shown_count -= self.shown.count(start, end)
+        self.shown.clear_range(start, end)
+        self.first_unshown = min(self.first_unshown, start)